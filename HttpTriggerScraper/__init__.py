@@ -1,35 +1,22 @@
+import contextlib
 import os
 import sys
 import logging
 import traceback
 import json
+import time
 import azure.functions as func
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """Azure Function HTTP-triggered entry point for the data collection scraper."""
+    started_at = time.monotonic()
     logging.info("⚡ Function starting up...")
-    
-    # Return diagnostic information dict to help troubleshoot
-    diagnostics = {
-        "environment": dict(os.environ),
-        "sys_path": sys.path,
-        "python_version": sys.version,
-        "req_method": req.method,
-        "req_url": str(req.url),
-        "req_headers": dict(req.headers),
-        "req_params": dict(req.params),
-    }
-
-    # Redact sensitive information from diagnostics
-    if "AZURE_STORAGE_CONNECTION_STRING" in diagnostics["environment"]:
-        diagnostics["environment"]["AZURE_STORAGE_CONNECTION_STRING"] = "REDACTED"
-    if "AzureWebJobsStorage" in diagnostics["environment"]:
-        diagnostics["environment"]["AzureWebJobsStorage"] = "REDACTED"
 
-    # Response dictionary
+    # Response dictionary; diagnostics are filled in once we know the full
+    # response is needed
     response = {
         "status": "initializing",
-        "diagnostics": diagnostics,
+        "diagnostics": None,
         "steps_completed": [],
         "errors": []
     }
@@ -37,6 +24,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     # For testing without the full scraper
     query_params = req.params
     if query_params.get("mode") == "diagnostic":
+        response["diagnostics"] = _build_diagnostics(req)
         response["status"] = "diagnostic_complete"
         return func.HttpResponse(
             json.dumps(response, indent=2, default=str), 
@@ -59,15 +47,59 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         logging.error(f"❌ {error_msg}\n{traceback.format_exc()}")
         response["errors"].append(error_msg)
 
-    # Step 2: Import scraper modules with detailed error reporting
+    # Retries must not outlive this invocation's functionTimeout. The deadline
+    # is set before the fast path and cleared on return, so a warm worker
+    # never carries it into its next invocation.
+    try:
+        from scraper.resilience import run_deadline
+        deadline_scope = run_deadline(started_at)
+    except ImportError:
+        # Reported in detail by the import step
+        deadline_scope = contextlib.nullcontext()
+    with deadline_scope as deadline:
+        return _run(req, response, started_at, deadline)
+
+def _run(req: func.HttpRequest, response: dict, started_at: float, run_deadline: float) -> func.HttpResponse:
+    """Answer the request once the scraper package is importable and the run deadline is set."""
+    query_params = req.params
+
+    # ?workers= overrides SCRAPER_MAX_WORKERS for this run
+    max_workers = None
+    if query_params.get("workers"):
+        workers = query_params.get("workers")
+        if not workers.isdecimal() or int(workers) < 1:
+            error_msg = f"Invalid workers parameter {workers!r}: expected a positive integer"
+            logging.error(f"❌ {error_msg}")
+            response["errors"].append(error_msg)
+            response["status"] = "invalid_request"
+            return func.HttpResponse(
+                json.dumps(response, indent=2, default=str),
+                mimetype="application/json",
+                status_code=400
+            )
+        max_workers = int(workers)
+
+    # Fast path: when every dataset is fresh, answer from one metadata query
+    # without fetching secrets or building scrapers. Otherwise the records it
+    # read are reused by the run below.
+    run_metadata = None
+    if not query_params.get("scraper"):
+        freshness = _check_freshness()
+        if freshness is not None and not freshness["due"]:
+            return _fresh_response(freshness, started_at)
+        if freshness is not None:
+            run_metadata = freshness["run_metadata"]
+
+    response["diagnostics"] = _build_diagnostics(req)
+
+    # Step 2: Import scraper modules with detailed error reporting. Only light
+    # modules are imported here; pandas and the blob SDK load on the code
+    # paths that process data.
     try:
         from scraper.config import SCRAPER_CONFIGS
         response["steps_completed"].append("import_config")
         
-        from scraper.base_scraper import MonthlyDataScraper
-        response["steps_completed"].append("import_base_scraper")
-        
-        from scraper.azure_blob import upload_raw_data
+        from scraper import azure_blob
         response["steps_completed"].append("import_azure_blob")
         
         response["scraper_count"] = len(SCRAPER_CONFIGS)
@@ -108,13 +140,15 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             logging.info(f"Running single scraper test for: {test_scraper}")
             
             # Create scraper instance
+            from scraper.base_scraper import MonthlyDataScraper
+            response["steps_completed"].append("import_base_scraper")
             scraper = MonthlyDataScraper(config)
             response["steps_completed"].append("created_scraper_instance")
             
             # Test blob storage access
-            from azure.storage.blob import BlobServiceClient
+            from scraper.storage_clients import get_blob_service_client
             connection_string = get_connection_string()
-            BlobServiceClient.from_connection_string(connection_string)
+            get_blob_service_client(connection_string)
             response["steps_completed"].append("blob_service_connection_test")
             
             # Try downloading
@@ -124,11 +158,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 logging.info(f"Successfully downloaded {len(content)} bytes")
                 
                 # Try processing (but don't actually save)
-                df = scraper.extract_data(content, config['sheet_name'], config['data_location'])
-                if df is not None:
+                tables = scraper.extract_tables(content, config['sheet_name'], config['data_location'])
+                if tables is not None:
                     response["steps_completed"].append("extract_data")
-                    response["dataframe_shape"] = list(df.shape)
-                    logging.info(f"Successfully extracted data: {df.shape}")
+                    response["dataframe_shape"] = list(tables[0].shape)
+                    response["range_count"] = len(tables)
+                    logging.info(f"Successfully extracted {len(tables)} ranges, first {tables[0].shape}")
             
             response["status"] = "single_scraper_test_complete"
             return func.HttpResponse(
@@ -147,53 +182,62 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=500
             )
 
-    # Process all scrapers
+    # Orchestrator mode: fan the due source files out to the work queue so
+    # QueueWorkerScraper instances process them in parallel
+    if query_params.get("mode") == "orchestrate":
+        try:
+            from scraper.pipeline import enqueue_source_files, plan_source_files
+            from scraper.work_queue import StorageWorkQueue
+
+            plan = plan_source_files(SCRAPER_CONFIGS)
+            response["source_file_count"] = len(plan)
+            enqueued = enqueue_source_files(plan, StorageWorkQueue(), run_metadata)
+            response["enqueued_files"] = enqueued["files"]
+            response["enqueued_scrapers"] = enqueued["scrapers"]
+            response["status"] = "enqueued"
+            logging.info(f"✅ Enqueued {len(enqueued['files'])} source files")
+        except Exception as e:
+            error_msg = f"Error enqueueing source files: {str(e)}"
+            logging.error(f"❌ {error_msg}\n{traceback.format_exc()}")
+            response["errors"].append(error_msg)
+            response["status"] = "failed"
+        return func.HttpResponse(
+            json.dumps(response, indent=2, default=str),
+            mimetype="application/json",
+            status_code=200 if not response["errors"] else 500
+        )
+
+    # Process all scrapers, downloading each source workbook only once and
+    # running the per-file pipelines concurrently
     try:
-        processed_scrapers = []
-        for name, config in SCRAPER_CONFIGS.items():
-            try:
-                logging.info(f"Processing scraper: {name}")
-                if config.get('type') == 'monthly':
-                    scraper = MonthlyDataScraper(config)
-                    
-                    # Check if update is needed
-                    if scraper.should_update(name):
-                        logging.info(f"Update needed for {name}")
-                        
-                        # Download Excel file
-                        content = scraper.download_excel(config.get('url'), config.get('file_name'))
-                        if content is None:
-                            logging.error(f"Failed to download Excel file for {name}.")
-                            continue
-                            
-                        # Upload raw data
-                        try:
-                            upload_raw_data(content, config.get('file_name'))
-                        except Exception as e:
-                            logging.error(f"Error uploading raw data for {name}: {str(e)}")
-                            
-                        # Extract and process
-                        df = scraper.extract_data(content, config.get('sheet_name'), config.get('data_location'))
-                        if df is None:
-                            logging.error(f"Data extraction failed for {name}.")
-                            continue
-                            
-                        processed = scraper.process_data(df)
-                        scraper.insert_data(processed)
-                        scraper.update_last_run(name)
-                        processed_scrapers.append(name)
-                        logging.info(f"Scraper {name} processed successfully.")
-                    else:
-                        logging.info(f"No update needed for {name}")
-                else:
-                    logging.warning(f"Unsupported scraper type: {config.get('type')}")
-            except Exception as e:
-                error_msg = f"Error processing scraper {name}: {str(e)}"
-                logging.error(f"❌ {error_msg}\n{traceback.format_exc()}")
-                response["errors"].append(error_msg)
+        from scraper.metrics import log_summary, recording
+        from scraper.pipeline import plan_source_files, run_source_files
+        from scraper.storage_clients import get_control_plane_calls
+
+        control_plane_before = get_control_plane_calls()
+        plan = plan_source_files(SCRAPER_CONFIGS)
+        response["source_file_count"] = len(plan)
+        logging.info(f"Planned {len(plan)} source files for {len(SCRAPER_CONFIGS)} scrapers")
+
+        # Per-stage wall time, bytes, rows and retries (None when METRICS_ENABLED is off)
+        with recording() as recorder:
+            result = run_source_files(plan, max_workers=max_workers, deadline=run_deadline,
+                                      run_metadata=run_metadata)
+        response["errors"].extend(result["errors"])
         
-        response["processed_scrapers"] = processed_scrapers
-        response["status"] = "complete"
+        response["processed_scrapers"] = result["processed"]
+        response["unchanged_scrapers"] = result["unchanged"]
+        response["deferred_scrapers"] = result["deferred"]
+        response["claimed_scrapers"] = result["claimed"]
+        response["write_stats"] = result["write_stats"]
+        control_plane_after = get_control_plane_calls()
+        response["control_plane_calls"] = {
+            key: control_plane_after[key] - control_plane_before[key] for key in control_plane_after
+        }
+        if recorder is not None:
+            response["metrics"] = recorder.summary()
+            log_summary(response["metrics"])
+        response["status"] = "partial" if result["deferred"] else "complete"
     except Exception as e:
         error_msg = f"Error during main scraper execution: {str(e)}"
         logging.error(f"❌ {error_msg}\n{traceback.format_exc()}")
@@ -204,4 +248,50 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         json.dumps(response, indent=2, default=str), 
         mimetype="application/json",
         status_code=200 if not response["errors"] else 500
-    )
\ No newline at end of file
+    )
+
+def _build_diagnostics(req: func.HttpRequest) -> dict:
+    """Return diagnostic information to help troubleshoot, with secrets redacted."""
+    diagnostics = {
+        "environment": dict(os.environ),
+        "sys_path": sys.path,
+        "python_version": sys.version,
+        "req_method": req.method,
+        "req_url": str(req.url),
+        "req_headers": dict(req.headers),
+        "req_params": dict(req.params),
+    }
+
+    # Redact sensitive information from diagnostics
+    if "AZURE_STORAGE_CONNECTION_STRING" in diagnostics["environment"]:
+        diagnostics["environment"]["AZURE_STORAGE_CONNECTION_STRING"] = "REDACTED"
+    if "AzureWebJobsStorage" in diagnostics["environment"]:
+        diagnostics["environment"]["AzureWebJobsStorage"] = "REDACTED"
+    return diagnostics
+
+def _check_freshness():
+    """
+    Return scraper.pipeline.check_freshness for every scraper, or None if
+    freshness could not be determined.
+    """
+    try:
+        from scraper.config import SCRAPER_CONFIGS
+        from scraper.pipeline import check_freshness
+
+        return check_freshness(SCRAPER_CONFIGS)
+    except Exception as e:
+        logging.warning(f"Freshness check failed, running the full scraper: {str(e)}")
+        return None
+
+def _fresh_response(freshness: dict, started_at: float) -> func.HttpResponse:
+    """Return the compact response sent when no scraper is due."""
+    from scraper.config import SCRAPER_CONFIGS
+
+    logging.info(f"✅ All {len(SCRAPER_CONFIGS)} scrapers are up to date")
+    response = {
+        "status": "up_to_date",
+        "scraper_count": len(SCRAPER_CONFIGS),
+        "next_due_in_seconds": round(freshness["next_due_in_seconds"]),
+        "elapsed_ms": round((time.monotonic() - started_at) * 1000, 1),
+    }
+    return func.HttpResponse(json.dumps(response), mimetype="application/json", status_code=200)
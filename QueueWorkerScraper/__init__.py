@@ -0,0 +1,43 @@
+import os
+import sys
+import logging
+import json
+import time
+import azure.functions as func
+
+def main(msg: func.QueueMessage) -> None:
+    """
+    Azure Function queue-triggered entry point that processes one source file.
+
+    Work items are enqueued by HttpTriggerScraper in orchestrator mode
+    (?mode=orchestrate), one per source file with due scrapers. Raising
+    lets the Functions host retry the message; scrapers that already
+    finished are no longer due, so a retry only redoes the failed ones.
+    """
+    started_at = time.monotonic()
+
+    parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+    from scraper.config import SCRAPER_CONFIGS
+    from scraper.metrics import log_summary, recording
+    from scraper.pipeline import run_work_item
+    from scraper.resilience import run_deadline
+
+    item = json.loads(msg.get_body().decode("utf-8"))
+    logging.info(f"⚡ Processing {item['file_name']} for {', '.join(item['scrapers'])} "
+                 f"(delivery {msg.dequeue_count})")
+
+    # Retries must not outlive this invocation's functionTimeout; the host
+    # runs several queue invocations at once, so the deadline is per invocation
+    with run_deadline(started_at), recording() as recorder:
+        result = run_work_item(item, SCRAPER_CONFIGS)
+    if recorder is not None:
+        log_summary(recorder.summary())
+
+    logging.info(f"✅ {item['file_name']}: {len(result['processed'])} processed, "
+                 f"{len(result['unchanged'])} unchanged, {len(result['claimed'])} claimed elsewhere, "
+                 f"{len(result['errors'])} errors")
+    if result["errors"]:
+        raise RuntimeError(f"Work item for {item['file_name']} failed: {'; '.join(result['errors'])}")
@@ -0,0 +1,135 @@
+# backfill.py
+
+"""
+Rebuild processed data from archived raw workbooks, without downloading
+anything from the source site:
+
+    python backfill.py                                  # local_raw/ -> local_processed/
+    python backfill.py --scraper Labor_Force --scraper Gas_Price
+    python backfill.py --source blob --output blob      # raw-data archive -> processed-data
+    python backfill.py --source blob --version 3f2a...  # a specific archived version
+
+With the default local source and output this runs fully offline: the
+workbooks are read from --raw-dir (named as saved by run_locally.py) and
+the outputs written to --out-dir as {table_name}.{format}. The blob source
+reads the latest version of each file from the content-addressed raw-data
+archive (or the version whose hash starts with --version), and the blob
+output uploads through the normal upload path. Run records are not
+touched.
+
+Source files are processed in parallel on a process pool, one workbook per
+task, so every scraper reading a workbook shares one decode.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scraper.config import FINAL_DATA_FORMAT, SCRAPER_CONFIGS
+from scraper.pipeline import plan_source_files
+
+def backfill_source_file(file_name: str, content: bytes, scrapers: list, output: str, out_dir: str) -> dict:
+    """Extract, process and write every scraper reading one workbook."""
+    from scraper.base_scraper import MonthlyDataScraper
+    from scraper.output_formats import get_output_format
+
+    result = {"processed": [], "rows": 0, "errors": []}
+    for name, config in scrapers:
+        try:
+            if config.get('type') != 'monthly':
+                raise ValueError(f"Unsupported scraper type: {config.get('type')}")
+            scraper = MonthlyDataScraper(config)
+            tables = scraper.extract_tables(content, config.get('sheet_name'), config.get('data_location'))
+            if tables is None:
+                raise ValueError(f"Data extraction failed for {file_name}")
+            processed = scraper.process_tables(tables)
+
+            if output == "blob":
+                scraper.insert_data(processed)
+            else:
+                serializer = get_output_format(config.get('output_format', FINAL_DATA_FORMAT))
+                path = os.path.join(out_dir, f"{config['table_name']}.{serializer.extension}")
+                with open(path, "wb") as f:
+                    f.write(serializer.serialize(processed, config.get('value_type', 'float')))
+
+            result["processed"].append(name)
+            result["rows"] += len(processed)
+        except Exception as e:
+            result["errors"].append(f"Error backfilling scraper {name}: {str(e)}")
+    return result
+
+def read_raw_file(file_name: str, source: str, raw_dir: str, version: str = None) -> bytes:
+    """Return the archived workbook, or None if there is no matching version."""
+    if source == "local":
+        path = os.path.join(raw_dir, file_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    from scraper.azure_blob import download_raw_data, get_raw_manifest
+    manifest = get_raw_manifest(file_name)
+    if version:
+        manifest = [entry for entry in manifest if entry["content_hash"].startswith(version)]
+    if not manifest:
+        return None
+    return download_raw_data(manifest[-1]["content_hash"])
+
+def select_scrapers(names: list) -> dict:
+    if not names:
+        return SCRAPER_CONFIGS
+    unknown = [name for name in names if name not in SCRAPER_CONFIGS]
+    if unknown:
+        raise SystemExit(f"Unknown scrapers: {', '.join(unknown)}")
+    return {name: SCRAPER_CONFIGS[name] for name in names}
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild processed data from archived raw workbooks")
+    parser.add_argument("--scraper", action="append", help="Scraper to rebuild (repeatable, default all)")
+    parser.add_argument("--source", choices=["local", "blob"], default="local", help="Where to read raw workbooks")
+    parser.add_argument("--raw-dir", default="local_raw", help="Directory of raw workbooks for --source local")
+    parser.add_argument("--version", help="Hash prefix of the archived version to use with --source blob")
+    parser.add_argument("--output", choices=["local", "blob"], default="local", help="Where to write outputs")
+    parser.add_argument("--out-dir", default="local_processed", help="Output directory for --output local")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.output == "local":
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    plan = plan_source_files(select_scrapers(args.scraper))
+    processed, rows, errors = [], 0, []
+
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(plan) or 1))) as executor:
+        futures = {}
+        for (_, file_name), scrapers in plan.items():
+            content = read_raw_file(file_name, args.source, args.raw_dir, args.version)
+            if content is None:
+                errors.append(f"No archived workbook for {file_name}")
+                continue
+            future = executor.submit(backfill_source_file, file_name, content, scrapers, args.output, args.out_dir)
+            futures[future] = file_name
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(f"Error backfilling {futures[future]}: {str(e)}")
+                continue
+            processed.extend(result["processed"])
+            rows += result["rows"]
+            errors.extend(result["errors"])
+
+    print(f"Rebuilt {len(processed)} scrapers ({rows} rows) from {len(futures)} workbooks "
+          f"in {time.perf_counter() - started:.2f}s")
+    for error in errors:
+        print(f"  {error}")
+    sys.exit(1 if errors else 0)
+
+if __name__ == '__main__':
+    main()
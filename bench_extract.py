@@ -0,0 +1,111 @@
+"""
+Benchmark range-limited sheet reads against full-sheet reads.
+
+Usage:
+    python bench_extract.py
+    python bench_extract.py --rows 5000 50000 --cols 60 --format xls
+
+Builds synthetic workbooks whose first rows follow the EDB layout (a
+13x11 table at A6:K18) followed by a large block of filler cells, then
+times the old path (parse the whole sheet, slice with iloc) against
+BaseEDBScraper.extract_data, which only reads the requested window.
+Both paths parse from the same opened workbook so only sheet parsing
+is measured. The `xls` format needs the optional `xlwt` package.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from io import BytesIO
+import pandas as pd
+
+MONTHS = ['July', 'August', 'September', 'October', 'November', 'December',
+          'January', 'February', 'March', 'April', 'May', 'June']
+SHEET_NAME = 'SHEET01'
+DATA_LOCATION = 'A6:K18'
+
+def build_workbook(filler_rows: int, filler_cols: int, file_format: str, whole_numbers: bool = False) -> bytes:
+    """Create a workbook with an EDB-style table followed by filler rows."""
+    cells = [(0, 0, 'Synthetic benchmark sheet'), (5, 0, 'Month')]
+    cells += [(5, 1 + j, 2014 + j) for j in range(10)]
+    for i, month in enumerate(MONTHS):
+        cells.append((6 + i, 0, month))
+        cells += [(6 + i, 1 + j, round(random.random() * 1000, 0 if whole_numbers else 2)) for j in range(10)]
+    for r in range(filler_rows):
+        cells += [(20 + r, c, float(r * c)) for c in range(filler_cols)]
+
+    buffer = BytesIO()
+    if file_format == 'xls':
+        import xlwt
+        workbook = xlwt.Workbook()
+        sheet = workbook.add_sheet(SHEET_NAME)
+        for row, col, value in cells:
+            sheet.write(row, col, value)
+        workbook.save(buffer)
+    else:
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = SHEET_NAME
+        for row, col, value in cells:
+            sheet.cell(row + 1, col + 1, value)
+        workbook.save(buffer)
+    return buffer.getvalue()
+
+def full_sheet_read(workbook: pd.ExcelFile) -> pd.DataFrame:
+    """The previous extraction path: load the whole sheet, then slice."""
+    df = workbook.parse(sheet_name=SHEET_NAME, header=None)
+    return df.iloc[5:18, 0:11]
+
+def measure(func, repeat: int) -> tuple:
+    """Return (best seconds, peak traced bytes, result) over `repeat` runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-sheet and range-limited Excel reads")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 20000],
+                        help="Filler row counts to benchmark")
+    parser.add_argument("--cols", type=int, default=20, help="Filler column count")
+    parser.add_argument("--format", choices=["xlsx", "xls"], default="xlsx")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from scraper.base_scraper import MonthlyDataScraper
+    from scraper.workbook_cache import open_workbook
+
+    scraper = MonthlyDataScraper({'table_name': 'benchmark', 'value_column': 'Value'})
+
+    # A table of whole numbers reads back as integers from the window but as
+    # floats from the full sheet; a float series must still process the same
+    content = build_workbook(10, args.cols, args.format, whole_numbers=True)
+    pd.testing.assert_frame_equal(
+        scraper.process_data(full_sheet_read(open_workbook(content))),
+        scraper.process_data(scraper.extract_data(content, SHEET_NAME, DATA_LOCATION)),
+    )
+
+    print(f"{'rows':>8} {'full (s)':>10} {'range (s)':>10} {'speedup':>8} {'full peak':>12} {'range peak':>12}")
+    for rows in args.rows:
+        content = build_workbook(rows, args.cols, args.format)
+        workbook = open_workbook(content)
+
+        full_time, full_peak, expected = measure(lambda: full_sheet_read(workbook), args.repeat)
+        range_time, range_peak, actual = measure(
+            lambda: scraper.extract_data(content, SHEET_NAME, DATA_LOCATION), args.repeat
+        )
+        pd.testing.assert_frame_equal(expected, actual)
+
+        print(f"{rows:>8} {full_time:>10.3f} {range_time:>10.3f} {full_time / range_time:>7.1f}x "
+              f"{full_peak / 1e6:>10.1f}MB {range_peak / 1e6:>10.1f}MB")
+
+if __name__ == "__main__":
+    main()
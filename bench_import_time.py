@@ -0,0 +1,100 @@
+"""
+Check the cold-start import cost of the HTTP trigger.
+
+Usage:
+    python bench_import_time.py
+    python bench_import_time.py --max-ms 500 --runs 10
+
+Imports the modules the trigger loads before it processes any data (the
+diagnostic and "nothing to update" paths) in fresh interpreters under
+`python -X importtime`, and reports the median total import time and the
+slowest top-level packages. Exits non-zero if the median exceeds --max-ms
+or if any heavy module (pandas, numpy, the blob SDK, Excel readers) is
+imported on that path.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules imported by HttpTriggerScraper.main before any workbook is processed
+COLD_START_IMPORTS = [
+    "HttpTriggerScraper",
+    "scraper.config",
+    "scraper.azure_blob",
+    "scraper.resilience",
+    "scraper.storage_clients",
+    "scraper.data_tracker",
+    "scraper.pipeline",
+]
+
+# Only needed once a source file has work to do
+HEAVY_MODULES = ["pandas", "numpy", "azure.storage.blob", "openpyxl", "xlrd", "pyarrow"]
+
+def run_importtime(statement: str) -> list:
+    """Run `statement` in a fresh interpreter and return its (name, cumulative us, nested) import records."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        records.append((name.strip(), int(cumulative), name.startswith("  ")))
+    return records
+
+def measure_imports(modules: list) -> tuple:
+    """
+    Import `modules` in a fresh interpreter with -X importtime. Returns the
+    total import time in microseconds, {top-level package: cumulative us}
+    and the set of every module imported. Modules the interpreter imports
+    at startup are left out.
+    """
+    startup = {name for name, _, _ in run_importtime("pass")}
+    total = 0
+    top_level = {}
+    imported = set()
+    for name, cumulative, nested in run_importtime(f"import {', '.join(modules)}"):
+        if name in startup:
+            continue
+        imported.add(name)
+        if not nested:
+            total += cumulative
+            package = name.split(".")[0]
+            top_level[package] = top_level.get(package, 0) + cumulative
+    return total, top_level, imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cold-start import time of the HTTP trigger")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument("--max-ms", type=float, default=600, help="Fail if the median import time exceeds this")
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, top_level, imported = measure_imports(COLD_START_IMPORTS)
+        totals.append(total)
+    median_ms = statistics.median(totals) / 1000
+
+    print(f"Cold-start imports: median {median_ms:.1f}ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.1f}ms, max {max(totals) / 1000:.1f}ms)")
+    for package, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:8]:
+        print(f"  {package:<24} {cumulative / 1000:>8.1f}ms")
+
+    failures = []
+    heavy = [module for module in HEAVY_MODULES if module in imported]
+    if heavy:
+        failures.append(f"heavy modules imported on the cold-start path: {', '.join(heavy)}")
+    if median_ms > args.max_ms:
+        failures.append(f"median import time {median_ms:.1f}ms exceeds {args.max_ms:.0f}ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Check that source file leases give each file to exactly one of several
+overlapping runs.
+
+Usage:
+    python bench_lease_contention.py
+    python bench_lease_contention.py --processes 8 --files 20 --rounds 10
+
+Each round starts --processes worker processes at once. Every worker
+walks the same --files names in a shuffled order and claims each one
+through scraper.leases.claim. As in pipeline.run_source_file, a worker
+that wins a lease first checks whether the file was already recorded as
+done, and otherwise holds the lease for --hold-ms and records it before
+releasing. A round passes if every file was processed exactly once.
+
+A final round checks takeover: a process acquires every lease and exits
+without releasing them, as a crashed run would. Workers started before
+the leases expire must skip every file; workers started after must take
+each one over exactly once.
+
+Leases are kept in a LocalLeaseStore in a temporary directory. Exits
+non-zero on any duplicate or missed file.
+"""
+
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+def worker(directory: str, names: list, hold_seconds: float, start, results) -> None:
+    from scraper.leases import LocalLeaseStore, claim
+
+    store = LocalLeaseStore(directory)
+    names = list(names)
+    random.shuffle(names)
+    start.wait()
+    processed = []
+    for name in names:
+        done = os.path.join(directory, f"{name}.done")
+        with claim(name, store, duration_seconds=60) as acquired:
+            # The run record is re-read under the lease and written before release
+            if acquired and not os.path.exists(done):
+                time.sleep(hold_seconds)
+                processed.append(name)
+                open(done, "w").close()
+    results.put((os.getpid(), processed))
+
+def crash(directory: str, names: list, duration_seconds: float) -> None:
+    """Acquire every lease and exit without releasing them."""
+    from scraper.leases import LocalLeaseStore, new_owner
+
+    store = LocalLeaseStore(directory)
+    for name in names:
+        store.acquire(name, new_owner(), duration_seconds)
+    os._exit(0)
+
+def run_round(directory: str, names: list, processes: int, hold_seconds: float) -> collections.Counter:
+    """Run `processes` competing workers and count how often each file was processed."""
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=worker, args=(directory, names, hold_seconds, start, results))
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    start.set()
+    counts = collections.Counter()
+    for _ in workers:
+        _, processed = results.get()
+        counts.update(processed)
+    for process in workers:
+        process.join()
+    return counts
+
+def check(label: str, counts: collections.Counter, names: list, expected: int) -> list:
+    failures = [
+        f"{label}: {name} processed {counts[name]} times, expected {expected}"
+        for name in names if counts[name] != expected
+    ]
+    print(f"{label}: {sum(counts.values())} files processed, {len(failures)} mismatches")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Check source file leases under contention")
+    parser.add_argument("--processes", type=int, default=4, help="Competing runs per round")
+    parser.add_argument("--files", type=int, default=12, help="Source files per round")
+    parser.add_argument("--rounds", type=int, default=5, help="Contention rounds")
+    parser.add_argument("--hold-ms", type=float, default=5, help="Time a won lease is held")
+    parser.add_argument("--expiry-ms", type=float, default=2000, help="Lease duration left by the crashed run")
+    args = parser.parse_args()
+
+    failures = []
+    started = time.perf_counter()
+    for round_number in range(args.rounds):
+        with tempfile.TemporaryDirectory() as directory:
+            names = [f"round{round_number}_file{index}.xlsx" for index in range(args.files)]
+            counts = run_round(directory, names, args.processes, args.hold_ms / 1000)
+            failures += check(f"round {round_number + 1}", counts, names, expected=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        names = [f"crashed_file{index}.xlsx" for index in range(args.files)]
+        crashed = multiprocessing.Process(target=crash, args=(directory, names, args.expiry_ms / 1000))
+        crashed.start()
+        crashed.join()
+        failures += check("before expiry", run_round(directory, names, args.processes, 0), names, expected=0)
+        time.sleep(args.expiry_ms / 1000)
+        counts = run_round(directory, names, args.processes, args.hold_ms / 1000)
+        failures += check("after expiry", counts, names, expected=1)
+
+    print(f"\n{args.rounds + 1} rounds of {args.processes} processes in {time.perf_counter() - started:.2f}s")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
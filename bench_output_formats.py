@@ -0,0 +1,63 @@
+"""
+Benchmark the processed-data output formats.
+
+Usage:
+    python bench_output_formats.py
+    python bench_output_formats.py --rows 1000 100000 1000000 --repeat 5
+
+Serializes synthetic processed series (a Date column plus an int or
+float value column) with every format in scraper.output_formats and
+reports bytes written, serialization time and the time to read the
+result back with pandas. Parquet needs the `pyarrow` package.
+"""
+
+import argparse
+import io
+import time
+import numpy as np
+import pandas as pd
+
+def build_series(rows: int, value_type: str) -> pd.DataFrame:
+    """Create a processed series of `rows` daily observations."""
+    rng = np.random.default_rng(rows)
+    # Wrap around so long series stay inside the datetime64[ns] range
+    dates = pd.Timestamp('1700-01-01') + pd.to_timedelta(np.arange(rows) % 100000, unit='D')
+    if value_type == 'int':
+        values = rng.integers(0, 50000, rows)
+    else:
+        values = rng.uniform(0, 10000, rows).round(2)
+    return pd.DataFrame({'Date': dates, 'Value': values})
+
+def read_back(name: str, payload: bytes) -> pd.DataFrame:
+    if name == 'csv':
+        return pd.read_csv(io.BytesIO(payload))
+    return pd.read_parquet(io.BytesIO(payload))
+
+def best_time(func, repeat: int) -> tuple:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare processed-data output formats")
+    parser.add_argument("--rows", type=int, nargs="+", default=[500, 50000, 500000],
+                        help="Series lengths to benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from scraper.output_formats import OUTPUT_FORMATS
+
+    print(f"{'type':>5} {'rows':>8} {'format':>8} {'bytes':>12} {'write (s)':>10} {'read (s)':>9}")
+    for value_type in ('int', 'float'):
+        for rows in args.rows:
+            data_df = build_series(rows, value_type)
+            for name, serializer in OUTPUT_FORMATS.items():
+                write_time, payload = best_time(lambda: serializer.serialize(data_df, value_type), args.repeat)
+                read_time, _ = best_time(lambda: read_back(name, payload), args.repeat)
+                print(f"{value_type:>5} {rows:>8} {name:>8} {len(payload):>12} {write_time:>10.4f} {read_time:>9.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Benchmark the full trigger pipeline offline.
+
+Usage:
+    python bench_pipeline.py
+    python bench_pipeline.py --files 40 --years 40 --extra-rows 2000 --workers 8
+    python bench_pipeline.py --latency-ms 50 --max-seconds 10
+
+Serves synthetic workbooks in the SCRAPER_CONFIGS sheet layout (a header
+row of fiscal years at row 6, month rows below) from a local HTTP server,
+and replaces blob storage and the ScraperMetadata table with in-memory
+stand-ins. HttpTriggerScraper.main is then run three times:
+
+    cold          every scraper due: download, archive, extract, process, upload
+    not_modified  every scraper due again, the server answers 304
+    fresh         nothing due, answered by the fast path
+
+A fourth pass, orchestrated, clears the run records and goes through the
+queue fan-out instead: the trigger's ?mode=orchestrate enqueues work items
+on a LocalWorkQueue, and each item is then delivered twice to
+QueueWorkerScraper, as a queue may redeliver after a worker crash. It
+fails unless every source file was enqueued once and every scraper was
+processed exactly once across both deliveries.
+
+--files scales the number of source workbooks by cloning the configured
+ones, --years sets the history length (fiscal-year columns) and
+--extra-rows/--extra-cols add filler cells to every sheet. The per-stage
+latency comes from the run metrics in the trigger response. Exits non-zero
+if a pass reports errors or the cold pass takes longer than --max-seconds.
+"""
+
+import argparse
+import collections
+import hashlib
+import http.server
+import io
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+MONTHS = ['July', 'August', 'September', 'October', 'November', 'December',
+          'January', 'February', 'March', 'April', 'May', 'June']
+
+def build_workbook(sheets: list, years: int, extra_rows: int, extra_cols: int) -> bytes:
+    """Build a workbook whose sheets match the 'A6:{last year column}18' layout."""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    for index, sheet_name in enumerate(sheets):
+        sheet = workbook.create_sheet(sheet_name)
+        filler = [float(column) for column in range(extra_cols)]
+        sheet.append([f"Synthetic series {sheet_name}"])
+        for _ in range(4):
+            sheet.append([])
+        sheet.append(['Month'] + [2024 - years + 1 + year for year in range(years)])
+        for month_index, month in enumerate(MONTHS):
+            values = [round((index + 1) * 100 + year * 12 + month_index + 0.25, 2) for year in range(years)]
+            sheet.append([month] + values + [None] + filler)
+        for row in range(extra_rows):
+            sheet.append([f"Note {row}"] + filler)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def build_configs(files: int, years: int, base_url: str) -> dict:
+    """Clone the configured scrapers onto `files` source workbooks served from `base_url`."""
+    from scraper.config import SCRAPER_CONFIGS
+    from scraper.pipeline import plan_source_files
+    from scraper.ranges import column_letters
+
+    last_column = column_letters(years)
+    groups = list(plan_source_files(SCRAPER_CONFIGS).values())
+    configs = {}
+    for index in range(files):
+        copy = index // len(groups)
+        suffix = f"_{copy}" if copy else ""
+        for name, config in groups[index % len(groups)]:
+            stem, _, extension = config['file_name'].rpartition('.')
+            configs[f"{name}{suffix}"] = dict(
+                config,
+                url=base_url,
+                file_name=f"{stem}{suffix}.{extension}",
+                table_name=f"{config['table_name']}{suffix}",
+                data_location=f"A6:{last_column}18",
+            )
+    return configs
+
+class WorkbookHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the generated workbooks, honouring If-None-Match."""
+    protocol_version = "HTTP/1.1"
+    files = {}
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        entry = self.files.get(self.path.rsplit('/', 1)[-1])
+        if entry is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content, etag = entry
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/vnd.ms-excel")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+class InMemoryBlobStore:
+    """Stand-in for the raw-data and processed-data containers."""
+    def __init__(self):
+        self.blobs = {}
+        self.bytes_uploaded = 0
+        self._lock = threading.Lock()
+
+    def upload(self, container_name: str, blob_name: str, data, **kwargs):
+        from azure.core.exceptions import ResourceExistsError
+        payload = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        with self._lock:
+            if kwargs.get("overwrite") is False and (container_name, blob_name) in self.blobs:
+                raise ResourceExistsError(f"{container_name}/{blob_name} already exists")
+            self.blobs[(container_name, blob_name)] = payload
+            self.bytes_uploaded += len(payload)
+
+    def download(self, container_name: str, blob_name: str):
+        with self._lock:
+            return self.blobs.get((container_name, blob_name))
+
+    def exists(self, container_name: str, blob_name: str) -> bool:
+        with self._lock:
+            return (container_name, blob_name) in self.blobs
+
+class InMemoryEntity(dict):
+    """A table row with its ETag under .metadata, like azure.data.tables.TableEntity."""
+    def __init__(self, row: dict, etag: str):
+        super().__init__(row)
+        self.metadata = {"etag": etag}
+
+class InMemoryTable:
+    """Stand-in for the ScraperMetadata table client, including ETag-conditional writes used by leases."""
+    url = "http://in-memory-table"
+
+    def __init__(self):
+        self.rows = {}
+        self.etags = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_entity(self, partition_key: str, row_key: str) -> dict:
+        from azure.core.exceptions import ResourceNotFoundError
+        with self._lock:
+            self.calls += 1
+            if (partition_key, row_key) not in self.rows:
+                raise ResourceNotFoundError(f"{partition_key}/{row_key} not found")
+            return InMemoryEntity(self.rows[(partition_key, row_key)], self.etags[(partition_key, row_key)])
+
+    def upsert_entity(self, entity: dict, mode=None) -> None:
+        with self._lock:
+            self.calls += 1
+            self._put(entity)
+
+    def create_entity(self, entity: dict) -> dict:
+        from azure.core.exceptions import ResourceExistsError
+        with self._lock:
+            self.calls += 1
+            if (entity["PartitionKey"], entity["RowKey"]) in self.rows:
+                raise ResourceExistsError(f"{entity['PartitionKey']}/{entity['RowKey']} already exists")
+            return self._put(entity)
+
+    def update_entity(self, entity: dict, mode=None, etag: str = None, match_condition=None) -> dict:
+        with self._lock:
+            self.calls += 1
+            self._check_etag((entity["PartitionKey"], entity["RowKey"]), etag)
+            return self._put(entity)
+
+    def delete_entity(self, partition_key: str, row_key: str, etag: str = None, match_condition=None) -> None:
+        with self._lock:
+            self.calls += 1
+            self._check_etag((partition_key, row_key), etag)
+            self.rows.pop((partition_key, row_key), None)
+
+    def _put(self, entity: dict) -> dict:
+        key = (entity["PartitionKey"], entity["RowKey"])
+        self.rows[key] = dict(entity)
+        self.etags[key] = f'W/"{time.monotonic_ns()}"'
+        return {"etag": self.etags[key]}
+
+    def _check_etag(self, key: tuple, etag: str) -> None:
+        from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+        if key not in self.rows:
+            raise ResourceNotFoundError(f"{key[0]}/{key[1]} not found")
+        if etag is not None and self.etags[key] != etag:
+            raise ResourceModifiedError(f"{key[0]}/{key[1]} was modified", response=None)
+
+    def submit_transaction(self, operations: list) -> None:
+        with self._lock:
+            self.calls += 1
+            for _, entity, _ in operations:
+                self._put(entity)
+
+    def query_entities(self, query: str) -> list:
+        partition_key = query.split("'")[1]
+        row_keys = set(re.findall(r"RowKey eq '([^']*)'", query))
+        with self._lock:
+            self.calls += 1
+            return [
+                dict(row) for (partition, row_key), row in self.rows.items()
+                if partition == partition_key and (not row_keys or row_key in row_keys)
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.rows.clear()
+            self.etags.clear()
+
+    def age_runs(self, hours: float) -> None:
+        """Move every run timestamp `hours` into the past, so all scrapers are due."""
+        stale = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+        with self._lock:
+            for (partition, _), row in self.rows.items():
+                if partition == "scraper":
+                    row["timestamp"] = stale
+
+def offline_storage(configs: dict, blobs: InMemoryBlobStore, table: InMemoryTable) -> list:
+    """Patches that point the scraper package at the in-memory stand-ins."""
+    from scraper import azure_blob, config, data_tracker
+    return [
+        mock.patch.object(config, "SCRAPER_CONFIGS", configs),
+        mock.patch.object(azure_blob, "get_connection_string", lambda force_refresh=False: "offline"),
+        mock.patch.object(azure_blob, "_upload_blob", blobs.upload),
+        mock.patch.object(azure_blob, "_download_blob", blobs.download),
+        mock.patch.object(azure_blob, "_blob_exists", blobs.exists),
+        mock.patch.object(data_tracker, "_get_table_client", lambda: table),
+    ]
+
+def run_trigger(workers: int) -> tuple:
+    import azure.functions as func
+    import HttpTriggerScraper
+
+    params = {"workers": str(workers)} if workers else {}
+    request = func.HttpRequest("GET", "http://localhost/api/HttpTriggerScraper", body=b"", params=params)
+    started = time.perf_counter()
+    response = HttpTriggerScraper.main(request)
+    return time.perf_counter() - started, json.loads(response.get_body())
+
+def run_orchestrated() -> tuple:
+    """
+    Enqueue through the trigger's orchestrate mode, then deliver every
+    work item twice to QueueWorkerScraper. Returns the elapsed seconds,
+    the trigger response, the (file_name, result) of each delivery and
+    the errors raised by workers.
+    """
+    import azure.functions as func
+    import HttpTriggerScraper
+    import QueueWorkerScraper
+    from scraper import pipeline, work_queue
+
+    work_items = work_queue.LocalWorkQueue()
+    deliveries = []
+    worker_errors = []
+    run_work_item = pipeline.run_work_item
+
+    def recording_run_work_item(item: dict, configs: dict) -> dict:
+        result = run_work_item(item, configs)
+        deliveries.append((item["file_name"], result))
+        return result
+
+    started = time.perf_counter()
+    with mock.patch.object(work_queue, "StorageWorkQueue", lambda: work_items), \
+            mock.patch.object(pipeline, "run_work_item", recording_run_work_item):
+        request = func.HttpRequest("GET", "http://localhost/api/HttpTriggerScraper", body=b"",
+                                   params={"mode": "orchestrate"})
+        body = json.loads(HttpTriggerScraper.main(request).get_body())
+        items = work_items.drain(lambda item: item)
+        for item in items + items:
+            try:
+                QueueWorkerScraper.main(func.QueueMessage(body=json.dumps(item).encode("utf-8")))
+            except Exception as e:
+                worker_errors.append(f"{item['file_name']}: {str(e)}")
+    return time.perf_counter() - started, body, deliveries, worker_errors
+
+def check_orchestrated(body: dict, deliveries: list, worker_errors: list, configs: dict, files: list) -> list:
+    """Return failures unless every file was enqueued once and every scraper processed exactly once."""
+    failures = [f"orchestrated pass: {error}" for error in body.get("errors", []) + worker_errors]
+    enqueued = collections.Counter(body.get("enqueued_files", []))
+    failures += [
+        f"orchestrated pass enqueued {file_name} {enqueued[file_name]} times"
+        for file_name in files if enqueued[file_name] != 1
+    ]
+    processed = collections.Counter(name for _, result in deliveries for name in result["processed"])
+    failures += [
+        f"orchestrated pass processed {name} {processed[name]} times"
+        for name in configs if processed[name] != 1
+    ]
+    return failures
+
+def report(name: str, seconds: float, body: dict, files: int, scrapers: int) -> None:
+    print(f"\n{name}: {seconds:.3f}s, status {body['status']}")
+    stages = (body.get("metrics") or {}).get("stages", {})
+    if not stages:
+        return
+    print(f"  {'stage':<18} {'calls':>6} {'total s':>9} {'mean ms':>9} {'MB in':>8} {'MB out':>8} {'rows':>9} {'retries':>8}")
+    for stage, totals in stages.items():
+        mean_ms = totals["seconds"] / totals["count"] * 1000 if totals["count"] else 0
+        print(f"  {stage:<18} {totals['count']:>6} {totals['seconds']:>9.3f} {mean_ms:>9.2f} "
+              f"{totals['bytes_in'] / 1e6:>8.2f} {totals['bytes_out'] / 1e6:>8.2f} "
+              f"{totals['rows']:>9} {totals['retries']:>8}")
+    downloaded = stages.get("download_excel", {}).get("bytes_in", 0)
+    rows = stages.get("process_data", {}).get("rows", 0)
+    print(f"  throughput: {files / seconds:.1f} files/s, {scrapers / seconds:.1f} scrapers/s, "
+          f"{downloaded / 1e6 / seconds:.2f} MB/s downloaded, {rows / seconds:.0f} rows/s processed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trigger pipeline against local stand-ins")
+    parser.add_argument("--files", type=int, default=10, help="Number of source workbooks")
+    parser.add_argument("--years", type=int, default=10, help="Fiscal-year columns per sheet")
+    parser.add_argument("--extra-rows", type=int, default=0, help="Filler rows below each table")
+    parser.add_argument("--extra-cols", type=int, default=0, help="Filler columns right of each table")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent source files (default SCRAPER_MAX_WORKERS)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated server latency per request")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if the cold pass takes longer")
+    args = parser.parse_args()
+    if args.years < 1:
+        parser.error("--years must be at least 1")
+
+    logging.basicConfig(level=logging.ERROR)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), WorkbookHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    WorkbookHandler.latency = args.latency_ms / 1000
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    from scraper.pipeline import plan_source_files
+    configs = build_configs(args.files, args.years, base_url)
+    started = time.perf_counter()
+    for (_, file_name), scrapers in plan_source_files(configs).items():
+        content = build_workbook([config['sheet_name'] for _, config in scrapers],
+                                 args.years, args.extra_rows, args.extra_cols)
+        WorkbookHandler.files[file_name] = (content, f'"{hashlib.sha256(content).hexdigest()[:16]}"')
+    total_bytes = sum(len(content) for content, _ in WorkbookHandler.files.values())
+    print(f"Generated {len(WorkbookHandler.files)} workbooks ({total_bytes / 1e6:.2f} MB) for "
+          f"{len(configs)} scrapers in {time.perf_counter() - started:.2f}s")
+
+    blobs = InMemoryBlobStore()
+    table = InMemoryTable()
+    failures = []
+    from scraper import metrics
+    # Per-stage numbers come from the run metrics, whatever METRICS_ENABLED says
+    patches = offline_storage(configs, blobs, table) + [mock.patch.object(metrics, "METRICS_ENABLED", True)]
+    for patch in patches:
+        patch.start()
+    try:
+        for name in ("cold", "not_modified", "fresh"):
+            if name == "not_modified":
+                table.age_runs(hours=48)
+            seconds, body = run_trigger(args.workers)
+            report(name, seconds, body, len(WorkbookHandler.files), len(configs))
+            if body.get("errors"):
+                failures.append(f"{name} pass reported {len(body['errors'])} errors: {body['errors'][0]}")
+            if name == "cold" and args.max_seconds is not None and seconds > args.max_seconds:
+                failures.append(f"cold pass took {seconds:.2f}s, above {args.max_seconds:.2f}s")
+
+        # Forget every run so the queue workers download and process each file again
+        table.clear()
+        seconds, body, deliveries, worker_errors = run_orchestrated()
+        processed = sum(len(result["processed"]) for _, result in deliveries)
+        print(f"\norchestrated: {seconds:.3f}s, status {body['status']}, "
+              f"{len(body.get('enqueued_files', []))} files enqueued, {len(deliveries)} deliveries, "
+              f"{processed} scrapers processed")
+        failures += check_orchestrated(body, deliveries, worker_errors, configs, list(WorkbookHandler.files))
+    finally:
+        for patch in patches:
+            patch.stop()
+        server.shutdown()
+
+    print(f"\nUploaded {blobs.bytes_uploaded / 1e6:.2f} MB to {len(blobs.blobs)} in-memory blobs, "
+          f"{table.calls} table calls")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
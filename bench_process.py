@@ -0,0 +1,103 @@
+"""
+Benchmark MonthlyDataScraper.process_data against the previous row-wise
+date construction.
+
+Usage:
+    python bench_process.py
+    python bench_process.py --years 30 100 400 --repeat 5
+
+Builds synthetic extracted tables in the EDB layout (a header row of
+fiscal years followed by twelve month rows) spanning several decades,
+runs both implementations on the same input and fails if their outputs
+differ.
+"""
+
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+MONTHS = ['July', 'August', 'September', 'October', 'November', 'December',
+          'January', 'February', 'March', 'April', 'May', 'June']
+
+def build_table(years: int, first_year: int = 1800) -> pd.DataFrame:
+    """Create an extracted sheet window with `years` fiscal-year columns."""
+    rng = np.random.default_rng(years)
+    header = ['Month'] + [first_year + i for i in range(years)]
+    rows = [[month] + list(rng.uniform(0, 1000, years).round(2)) for month in MONTHS]
+    # A footnote row and a few blanks, as found in real sheets
+    rows.append(['Note: preliminary'] + [None] * years)
+    rows[3][5 % years + 1] = None
+    return pd.DataFrame([header] + rows)
+
+def legacy_create_date(row: pd.Series):
+    """The previous per-row implementation of MonthlyDataScraper._create_date."""
+    month_mapping = {
+        'July': 7, 'August': 8, 'September': 9, 'October': 10,
+        'November': 11, 'December': 12, 'January': 1, 'February': 2,
+        'March': 3, 'April': 4, 'May': 5, 'June': 6
+    }
+    month_num = month_mapping.get(row['Month'])
+    if not month_num:
+        return None
+    year = int(row['Year'])
+    if month_num >= 7:
+        return pd.to_datetime(f'{year - 1}-{month_num}-01')
+    else:
+        return pd.to_datetime(f'{year}-{month_num}-01')
+
+def legacy_process_data(config: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """The previous MonthlyDataScraper.process_data, using df.apply(axis=1)."""
+    df.columns = ['Month'] + [int(year) for year in df.iloc[0, 1:]]
+    df = df.iloc[1:].reset_index(drop=True)
+    df_melted = pd.melt(df, id_vars=['Month'], var_name='Year', value_name=config['value_column'])
+    df_melted['Date'] = df_melted.apply(legacy_create_date, axis=1)
+    df_melted = df_melted.dropna(subset=['Date'])
+    df_melted = df_melted.sort_values(by='Date').reset_index(drop=True)
+    if config.get('value_type', 'float') == 'int':
+        df_melted[config['value_column']] = pd.to_numeric(df_melted[config['value_column']], errors='coerce')
+        df_melted = df_melted.dropna(subset=[config['value_column']])
+        df_melted[config['value_column']] = df_melted[config['value_column']].round().astype(int)
+    else:
+        df_melted[config['value_column']] = pd.to_numeric(df_melted[config['value_column']], errors='coerce')
+        df_melted = df_melted.dropna(subset=[config['value_column']])
+    return df_melted[['Date', config['value_column']]]
+
+def best_time(func, table: pd.DataFrame, repeat: int) -> tuple:
+    best = float('inf')
+    for _ in range(repeat):
+        df = table.copy()
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vectorized and row-wise process_data")
+    parser.add_argument("--years", type=int, nargs="+", default=[10, 50, 200, 400],
+                        help="Number of fiscal-year columns in each synthetic table")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from scraper.base_scraper import MonthlyDataScraper
+
+    print(f"{'years':>6} {'rows':>7} {'row-wise (s)':>13} {'vectorized (s)':>15} {'speedup':>8}")
+    for value_type in ('float', 'int'):
+        config = {'table_name': 'benchmark', 'value_column': 'Value', 'value_type': value_type}
+        scraper = MonthlyDataScraper(config)
+        for years in args.years:
+            table = build_table(years)
+            legacy_time, expected = best_time(lambda df: legacy_process_data(config, df), table, args.repeat)
+            new_time, actual = best_time(scraper.process_data, table, args.repeat)
+            try:
+                pd.testing.assert_frame_equal(expected, actual)
+            except AssertionError as e:
+                print(f"Output mismatch for {years} years ({value_type}): {e}")
+                sys.exit(1)
+            print(f"{years:>6} {len(actual):>7} {legacy_time:>13.4f} {new_time:>15.4f} "
+                  f"{legacy_time / new_time:>7.1f}x  ({value_type})")
+    print("Outputs identical")
+
+if __name__ == "__main__":
+    main()
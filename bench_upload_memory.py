@@ -0,0 +1,126 @@
+"""
+Measure peak memory of the processed-data upload path.
+
+Usage:
+    python bench_upload_memory.py
+    python bench_upload_memory.py --rows 1000000
+
+Runs the previous upload path (DataFrame -> StringIO -> str -> SDK
+encode) and azure_blob.upload_final_data (DataFrame -> bytes handed to
+the SDK) in separate processes against a local HTTP endpoint that
+accepts blob PUTs. Each process reports the growth of its peak RSS and
+the tracemalloc peak while serializing and uploading a large synthetic
+series. Exits non-zero if the current path does not use less memory
+than the previous one.
+"""
+
+import argparse
+import gc
+import http.server
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+ACCOUNT = "devstoreaccount1"
+ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+
+class BlobSinkHandler(http.server.BaseHTTPRequestHandler):
+    """Accepts container and blob PUTs and discards the body."""
+    protocol_version = "HTTP/1.1"
+
+    def do_PUT(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+        self.send_response(201)
+        self.send_header("ETag", '"0x1"')
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def start_sink() -> int:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), BlobSinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+def connection_string(port: int) -> str:
+    return (
+        f"DefaultEndpointsProtocol=http;AccountName={ACCOUNT};AccountKey={ACCOUNT_KEY};"
+        f"BlobEndpoint=http://127.0.0.1:{port}/{ACCOUNT};"
+    )
+
+def build_series(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp('1700-01-01') + pd.to_timedelta(np.arange(rows) % 100000, unit='D')
+    return pd.DataFrame({'Date': dates, 'Value': rng.uniform(0, 10000, rows).round(2)})
+
+def legacy_upload(data_df: pd.DataFrame, conn_str: str):
+    """The previous upload_final_data body."""
+    import io
+    from azure.storage.blob import BlobServiceClient
+    container_client = BlobServiceClient.from_connection_string(conn_str).get_container_client("processed-data")
+    csv_buffer = io.StringIO()
+    data_df.to_csv(csv_buffer, index=False)
+    container_client.get_blob_client("bench.csv").upload_blob(csv_buffer.getvalue(), overwrite=True)
+
+def current_upload(data_df: pd.DataFrame, conn_str: str):
+    from scraper import azure_blob
+    azure_blob.upload_final_data(data_df, "bench")
+
+def run_child(path: str, rows: int):
+    port = start_sink()
+    conn_str = connection_string(port)
+    os.environ["AZURE_STORAGE_CONNECTION_STRING"] = conn_str
+    os.environ.pop("KEY_VAULT_NAME", None)
+    upload = legacy_upload if path == "legacy" else current_upload
+
+    # Warm up imports and connections so only the payload is measured
+    upload(build_series(10), conn_str)
+    data_df = build_series(rows)
+    gc.collect()
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    upload(data_df, conn_str)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"rss_growth_kb": rss_after - rss_before, "traced_peak": traced_peak}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of processed-data uploads")
+    parser.add_argument("--rows", type=int, default=500000, help="Rows in the synthetic series")
+    parser.add_argument("--child", choices=["legacy", "current"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows)
+        return
+
+    results = {}
+    for path in ("legacy", "current"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", path, "--rows", str(args.rows)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[path] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'path':>8} {'peak RSS growth':>16} {'traced peak':>12}")
+    for path, result in results.items():
+        print(f"{path:>8} {result['rss_growth_kb'] / 1024:>14.1f}MB {result['traced_peak'] / 1e6:>10.1f}MB")
+
+    if results["current"]["traced_peak"] >= results["legacy"]["traced_peak"]:
+        print("Current upload path does not reduce peak memory")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -26,55 +26,68 @@ if not os.getenv("AZURE_STORAGE_CONNECTION_STRING"):
 from scraper.config import SCRAPER_CONFIGS
 from scraper.base_scraper import MonthlyDataScraper
 from scraper.azure_blob import upload_raw_data
+from scraper.pipeline import plan_source_files
 
 # Set up proper logging configuration
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 def run_scrapers():
-    for name, config in SCRAPER_CONFIGS.items():
-        logging.info(f"Processing scraper: {name}")
+    # Download each source workbook once and share it across its scrapers
+    for (url, file_name), scrapers in plan_source_files(SCRAPER_CONFIGS).items():
+        pending = []
+        for name, config in scrapers:
+            logging.info(f"Processing scraper: {name}")
+            
+            if config['type'] == 'monthly':
+                scraper = MonthlyDataScraper(config)
+            else:
+                logging.warning(f"Unsupported scraper type: {config['type']}")
+                continue
+            
+            if scraper.should_update(name):
+                pending.append((name, config, scraper))
+            else:
+                logging.info(f"No update needed for {name}")
         
-        if config['type'] == 'monthly':
-            scraper = MonthlyDataScraper(config)
-        else:
-            logging.warning(f"Unsupported scraper type: {config['type']}")
+        if not pending:
             continue
         
-        if scraper.should_update(name):
-            content = scraper.download_excel(config['url'], config['file_name'])
-            if not content:
-                logging.error(f"Failed to download file for {name}")
-                continue
-            
-            # Optionally upload raw data for local testing
-            try:
-                upload_raw_data(content, config['file_name'])
-                logging.info(f"Uploaded raw data for {name}")
-            except Exception as e:
-                logging.error(f"Failed to upload raw data: {str(e)}")
-            
-            raw_path = os.path.join("local_raw", config['file_name'])
-            os.makedirs("local_raw", exist_ok=True)
-            with open(raw_path, "wb") as f:
-                f.write(content)
-            logging.info(f"Saved raw file locally at {raw_path}")
-            
-            df = scraper.extract_data(content, config['sheet_name'], config['data_location'])
-            if df is None:
+        fetch = pending[0][2].fetch_excel(url, file_name)
+        if not fetch or not fetch["content"]:
+            logging.error(f"Failed to download {file_name} for {', '.join(name for name, _, _ in pending)}")
+            continue
+        content = fetch["content"]
+        # Stored with each run record so the next run can send a conditional request
+        validators = {key: fetch[key] for key in ("etag", "last_modified", "content_hash")}
+        
+        # Optionally upload raw data for local testing
+        try:
+            upload_raw_data(content, file_name)
+            logging.info(f"Uploaded raw data for {file_name}")
+        except Exception as e:
+            logging.error(f"Failed to upload raw data: {str(e)}")
+        
+        raw_path = os.path.join("local_raw", file_name)
+        os.makedirs("local_raw", exist_ok=True)
+        with open(raw_path, "wb") as f:
+            f.write(content)
+        logging.info(f"Saved raw file locally at {raw_path}")
+        
+        for name, config, scraper in pending:
+            tables = scraper.extract_tables(content, config['sheet_name'], config['data_location'])
+            if tables is None:
                 logging.error(f"Extraction failed for {name}")
                 continue
             
-            processed = scraper.process_data(df)
+            processed = scraper.process_tables(tables)
             processed_path = os.path.join("local_processed", f"processed_{config['table_name']}.csv")
             os.makedirs("local_processed", exist_ok=True)
             processed.to_csv(processed_path, index=False)
             logging.info(f"Processed data saved locally at {processed_path}")
             
-            scraper.update_last_run(name)
+            scraper.update_last_run(name, validators)
             logging.info(f"Scraper {name} updated successfully.")
-        else:
-            logging.info(f"No update needed for {name}")
 
 if __name__ == '__main__':
     run_scrapers()
\ No newline at end of file
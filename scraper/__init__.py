@@ -1,11 +1,34 @@
 # scraper/__init__.py
 
-# Import main modules to simplify imports elsewhere
-from scraper.base_scraper import BaseEDBScraper, MonthlyDataScraper
-from scraper.config import SCRAPER_CONFIGS, TABLES_TO_CREATE
-from scraper.azure_blob import upload_raw_data, upload_final_data
-from scraper.data_tracker import update_last_run, get_last_run
+# Re-export the main entry points to simplify imports elsewhere. They are
+# resolved on first access (PEP 562), so importing a light submodule such as
+# scraper.config does not pull in pandas or the Azure SDKs.
+import importlib
+
+_EXPORTS = {
+    "BaseEDBScraper": "scraper.base_scraper",
+    "MonthlyDataScraper": "scraper.base_scraper",
+    "SCRAPER_CONFIGS": "scraper.config",
+    "TABLES_TO_CREATE": "scraper.config",
+    "upload_raw_data": "scraper.azure_blob",
+    "upload_final_data": "scraper.azure_blob",
+    "update_last_run": "scraper.data_tracker",
+    "get_last_run": "scraper.data_tracker",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
 # Add logging configuration
 import logging
-logging.getLogger(__name__).setLevel(logging.INFO)
\ No newline at end of file
+logging.getLogger(__name__).setLevel(logging.INFO)
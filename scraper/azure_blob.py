@@ -1,21 +1,80 @@
 # scraper/azure_blob.py
 
 import os
-import io
-import pandas as pd
+import json
+import hashlib
+import threading
+import time
 import logging
-from azure.storage.blob import BlobServiceClient
-from azure.core.exceptions import ResourceExistsError
+from datetime import datetime
+from typing import TYPE_CHECKING
+from azure.core.exceptions import (
+    ClientAuthenticationError,
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceNotFoundError,
+)
+from scraper.config import CONNECTION_STRING_TTL_SECONDS
+from scraper.output_formats import get_output_format
+from scraper.resilience import call_with_retry
+from scraper.storage_clients import ensure_container, get_container_client, invalidate_container, storage_host
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Container names based on the guide
 RAW_DATA_CONTAINER = "raw-data"       # Stores raw files downloaded from government sources
-FINAL_DATA_CONTAINER = "processed-data"  # Stores processed data (e.g., CSV format)
+FINAL_DATA_CONTAINER = "processed-data"  # Stores processed data (CSV or Parquet)
+
+# Layout of the raw data container: workbooks are stored once under their
+# SHA-256 and each source file has a manifest listing the versions fetched
+RAW_OBJECT_PREFIX = "objects"
+RAW_MANIFEST_PREFIX = "manifests"
+
+# How processed series are written (see upload_final_data)
+WRITE_MODES = ("full", "incremental")
 
-def get_connection_string():
+# Process-level cache of the storage connection string. Refreshes are
+# single-flight: concurrent callers wait on the lock and reuse the result.
+_secret_lock = threading.Lock()
+_cached_connection_string = None
+_cached_at = None
+_key_vault_client = None
+
+def get_connection_string(force_refresh: bool = False):
     """
     Get the storage connection string, trying Key Vault first and
     falling back to environment variables if necessary.
+
+    The value is cached for CONNECTION_STRING_TTL_SECONDS. Pass
+    `force_refresh=True` after an authentication failure to fetch it again.
     """
+    global _cached_connection_string, _cached_at
+    requested_at = time.monotonic()
+    if not force_refresh and _is_cache_fresh(requested_at):
+        return _cached_connection_string
+
+    with _secret_lock:
+        if _cached_at is not None and (
+            _cached_at >= requested_at or (not force_refresh and _is_cache_fresh(time.monotonic()))
+        ):
+            # Another caller refreshed the secret while we were waiting
+            return _cached_connection_string
+
+        connection_string = _fetch_connection_string()
+        _cached_connection_string = connection_string
+        _cached_at = time.monotonic()
+        return connection_string
+
+def _is_cache_fresh(now: float) -> bool:
+    return (
+        _cached_connection_string is not None
+        and _cached_at is not None
+        and now - _cached_at < CONNECTION_STRING_TTL_SECONDS
+    )
+
+def _fetch_connection_string():
+    global _key_vault_client
     try:
         # Try to get the connection string from Key Vault
         if os.getenv("KEY_VAULT_NAME"):
@@ -27,9 +86,10 @@ def get_connection_string():
             secret_name = "Storage-Connection-String"
             
             try:
-                credential = DefaultAzureCredential()
-                client = SecretClient(vault_url=key_vault_uri, credential=credential)
-                connection_string = client.get_secret(secret_name).value
+                # Reuse the credential and client so the credential chain is only probed once
+                if _key_vault_client is None or _key_vault_client.vault_url.rstrip("/") != key_vault_uri.rstrip("/"):
+                    _key_vault_client = SecretClient(vault_url=key_vault_uri, credential=DefaultAzureCredential())
+                connection_string = _key_vault_client.get_secret(secret_name).value
                 logging.info("Successfully retrieved connection string from Key Vault")
                 return connection_string
             except Exception as e:
@@ -48,53 +108,249 @@ def get_connection_string():
         logging.error(f"Failed to get connection string: {str(e)}")
         raise
 
-def upload_raw_data(content: bytes, blob_name: str):
-    """Upload the raw Excel file to the designated raw data container."""
+def upload_raw_data(content: bytes, file_name: str, content_hash: str = None, fetched_at: str = None) -> dict:
+    """
+    Archive a raw Excel file in the content-addressed raw data store.
+
+    The workbook is stored once as objects/{sha256}; if that object already
+    exists nothing is uploaded. Every call appends an entry (fetched_at,
+    content_hash, size) to manifests/{file_name}.json, which gives a
+    versioned history of the file for reprocessing. Pass `content_hash`
+    when the caller has already hashed the content (see
+    scraper.downloader). Returns the hash and the number of bytes uploaded.
+    """
     try:
-        connection_string = get_connection_string()
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-        container_client = blob_service_client.get_container_client(RAW_DATA_CONTAINER)
-        
-        # Create the container if it does not exist
-        try:
-            container_client.create_container()
-        except ResourceExistsError:
-            # Container already exists - this is expected
-            pass
-        except Exception as e:
-            # Log other errors but continue
-            logging.error(f"Error creating container {RAW_DATA_CONTAINER}: {str(e)}")
-        
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.upload_blob(content, overwrite=True)
-        logging.info(f"Uploaded raw data to blob: {blob_name}")
+        content_hash = content_hash or hashlib.sha256(content).hexdigest()
+        fetched_at = fetched_at or datetime.utcnow().isoformat()
+        uploaded = _store_raw_object(content, content_hash)
+
+        manifest_name = f"{RAW_MANIFEST_PREFIX}/{file_name}.json"
+        stored = _download_blob(RAW_DATA_CONTAINER, manifest_name)
+        manifest = json.loads(stored) if stored else []
+        manifest.append({"fetched_at": fetched_at, "content_hash": content_hash, "size": len(content)})
+        _upload_blob(RAW_DATA_CONTAINER, manifest_name, json.dumps(manifest, indent=1),
+                     content_settings=_content_settings("application/json"))
+
+        if uploaded:
+            logging.info(f"Archived raw data for {file_name} as {content_hash}")
+        else:
+            logging.info(f"Raw data for {file_name} already archived as {content_hash}, skipped upload")
+        return {"content_hash": content_hash, "bytes_uploaded": len(content) if uploaded else 0}
     except Exception as e:
         logging.error(f"Error uploading raw data to blob storage: {str(e)}")
         raise
 
-def upload_final_data(data_df: pd.DataFrame, table_name: str):
-    """Upload the processed data (as CSV) to the final data container (Data Lake)."""
+def get_raw_manifest(file_name: str) -> list:
+    """Return the archived versions of `file_name`, oldest first."""
+    stored = _download_blob(RAW_DATA_CONTAINER, f"{RAW_MANIFEST_PREFIX}/{file_name}.json")
+    return json.loads(stored) if stored else []
+
+def download_raw_data(content_hash: str):
+    """Return an archived raw file by its SHA-256, or None if it is not stored."""
+    return _download_blob(RAW_DATA_CONTAINER, f"{RAW_OBJECT_PREFIX}/{content_hash}")
+
+def _store_raw_object(content: bytes, content_hash: str) -> bool:
+    """
+    Upload a raw file under its hash unless it is already stored. Returns
+    whether any bytes were uploaded.
+    """
+    blob_name = f"{RAW_OBJECT_PREFIX}/{content_hash}"
+    if _blob_exists(RAW_DATA_CONTAINER, blob_name):
+        return False
     try:
-        connection_string = get_connection_string()
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-        container_client = blob_service_client.get_container_client(FINAL_DATA_CONTAINER)
-        
-        # Create the container if needed
-        try:
-            container_client.create_container()
-        except ResourceExistsError:
-            # Container already exists - this is expected
-            pass
-        except Exception as e:
-            # Log other errors but continue
-            logging.error(f"Error creating container {FINAL_DATA_CONTAINER}: {str(e)}")
-        
-        csv_buffer = io.StringIO()
-        data_df.to_csv(csv_buffer, index=False)
-        blob_name = f"{table_name}.csv"
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.upload_blob(csv_buffer.getvalue(), overwrite=True)
+        # If-None-Match: * so a concurrent writer of the same content wins quietly
+        _upload_blob(RAW_DATA_CONTAINER, blob_name, content, length=len(content), overwrite=False,
+                     content_settings=_content_settings("application/vnd.ms-excel"))
+    except ResourceExistsError:
+        return False
+    return True
+
+def upload_final_data(data_df: "pd.DataFrame", table_name: str, write_mode: str = "full",
+                      output_format: str = "csv", value_type: str = "float") -> dict:
+    """
+    Upload the processed data to the final data container (Data Lake).
+
+    `output_format` names a serializer from scraper.output_formats (CSV or
+    Parquet) and `value_type` is the config's value type, which fixes the
+    Parquet column type. In "full" mode the whole series is written to
+    {table_name}.{extension}. In "incremental" mode only the years
+    containing new or revised rows are rewritten (see
+    upload_incremental_data). Returns the write statistics.
+    """
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode '{write_mode}'. Available modes: {', '.join(WRITE_MODES)}")
+    if write_mode == "incremental":
+        return upload_incremental_data(data_df, table_name, output_format, value_type)
+    try:
+        serializer = get_output_format(output_format)
+        blob_name = f"{table_name}.{serializer.extension}"
+        bytes_written = _upload_serialized(serializer, blob_name, data_df, value_type)
         logging.info(f"Uploaded final data to blob: {blob_name}")
+        return {
+            "mode": "full",
+            "format": serializer.name,
+            "rows_written": len(data_df),
+            "bytes_written": bytes_written,
+        }
     except Exception as e:
         logging.error(f"Error uploading final data to blob storage: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def upload_incremental_data(data_df: "pd.DataFrame", table_name: str, output_format: str = "csv",
+                            value_type: str = "float") -> dict:
+    """
+    Write only the yearly partitions of a processed series that changed.
+
+    The series is stored as one file per calendar year under
+    {table_name}/{year}.{extension}, next to {table_name}/_digest.{extension}.json,
+    which maps each year to its row count and a short hash of its rows. The
+    digest is kept per format, so switching a table between CSV and Parquet
+    writes every partition in the new format on the next run.
+    Each run hashes its partitions, compares them with the digest and
+    rewrites only the partitions that differ, followed by the digest. The
+    digest is a few dozen bytes per year, so both reading it and writing
+    it stay small and upload size tracks the change rather than the length
+    of the history.
+    """
+    try:
+        serializer = get_output_format(output_format)
+        digest_name = f"{table_name}/_digest.{serializer.extension}.json"
+        stored = _download_blob(FINAL_DATA_CONTAINER, digest_name)
+        digest = json.loads(stored) if stored else {}
+
+        changed = []
+        for year, partition in data_df.groupby(data_df['Date'].dt.year, sort=True):
+            entry = {"rows": len(partition), "hash": _partition_hash(partition)}
+            if digest.get(str(year)) != entry:
+                digest[str(year)] = entry
+                changed.append((year, partition))
+
+        bytes_written = 0
+        for year, partition in changed:
+            blob_name = f"{table_name}/{year}.{serializer.extension}"
+            bytes_written += _upload_serialized(serializer, blob_name, partition, value_type)
+
+        if changed:
+            digest_payload = json.dumps(digest, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            _upload_blob(FINAL_DATA_CONTAINER, digest_name, digest_payload, length=len(digest_payload),
+                         content_settings=_content_settings("application/json"))
+            bytes_written += len(digest_payload)
+
+        rows_written = sum(len(partition) for _, partition in changed)
+        logging.info(
+            f"Incremental upload for {table_name}: {len(changed)} partitions written ({rows_written} rows)"
+        )
+        return {
+            "mode": "incremental",
+            "format": serializer.name,
+            "rows_written": rows_written,
+            "partitions_written": len(changed),
+            "bytes_written": bytes_written,
+        }
+    except Exception as e:
+        logging.error(f"Error uploading incremental data to blob storage: {str(e)}")
+        raise
+
+def _partition_hash(partition: "pd.DataFrame") -> str:
+    # 64 bits of SHA-256 over the rows is plenty to notice a changed partition
+    return hashlib.sha256(partition.to_csv(index=False).encode("utf-8")).hexdigest()[:16]
+
+def _upload_serialized(serializer, blob_name: str, data_df: "pd.DataFrame", value_type: str = "float") -> int:
+    """
+    Serialize `data_df` with `serializer` and upload it with the matching
+    content type. The serializer returns bytes, which the SDK sends without
+    re-encoding or copying, and the explicit length spares it from probing
+    the payload. Returns the number of bytes uploaded.
+    """
+    payload = serializer.serialize(data_df, value_type)
+    _upload_blob(FINAL_DATA_CONTAINER, blob_name, payload, length=len(payload),
+                 content_settings=_content_settings(serializer.content_type))
+    return len(payload)
+
+def _content_settings(content_type: str):
+    # Imported here so loading this module does not load the blob SDK
+    from azure.storage.blob import ContentSettings
+    return ContentSettings(content_type=content_type)
+
+def _download_blob(container_name: str, blob_name: str):
+    """Return the content of a blob, or None if it (or its container) does not exist."""
+    def download(connection_string: str):
+        container_client = get_container_client(connection_string, container_name)
+        blob_client = container_client.get_blob_client(blob_name)
+        return call_with_retry(
+            lambda: blob_client.download_blob().readall(),
+            host=storage_host(container_client),
+            description=f"download {container_name}/{blob_name}",
+        )
+
+    try:
+        return _with_secret_refresh(f"download {blob_name}", download)
+    except ResourceNotFoundError:
+        return None
+
+def _blob_exists(container_name: str, blob_name: str) -> bool:
+    """Check whether a blob exists, treating a missing container as a missing blob."""
+    def exists(connection_string: str) -> bool:
+        container_client = get_container_client(connection_string, container_name)
+        blob_client = container_client.get_blob_client(blob_name)
+        return call_with_retry(
+            blob_client.exists,
+            host=storage_host(container_client),
+            description=f"check {container_name}/{blob_name}",
+        )
+
+    return _with_secret_refresh(f"check {blob_name}", exists)
+
+def _upload_blob(container_name: str, blob_name: str, data, **kwargs):
+    """
+    Upload `data` to `container_name`, creating the container only the first
+    time it is used in this process. If the container has since been deleted
+    the upload returns 404, so it is recreated and the upload retried once;
+    an authentication failure refreshes the cached connection string and
+    retries once (see _with_secret_refresh).
+    """
+    _with_secret_refresh(
+        f"upload {blob_name}",
+        lambda connection_string: _upload_to_container(connection_string, container_name, blob_name, data, **kwargs),
+    )
+
+def _with_secret_refresh(description: str, func):
+    """
+    Run `func(connection_string)` with the cached connection string. The
+    secret may have been rotated since it was cached, so an authentication
+    failure fetches it again and retries `func` once.
+    """
+    connection_string = get_connection_string()
+    try:
+        return func(connection_string)
+    except HttpResponseError as e:
+        if not _is_auth_failure(e):
+            raise
+        logging.warning(f"Authentication failed to {description}, refreshing connection string")
+        return func(get_connection_string(force_refresh=True))
+
+def _upload_to_container(connection_string: str, container_name: str, blob_name: str, data, **kwargs):
+    container_client = ensure_container(connection_string, container_name)
+    try:
+        _put_blob(container_client, blob_name, data, **kwargs)
+    except ResourceNotFoundError:
+        logging.warning(f"Container {container_name} not found, recreating it")
+        invalidate_container(connection_string, container_name)
+        container_client = ensure_container(connection_string, container_name)
+        _put_blob(container_client, blob_name, data, **kwargs)
+
+def _put_blob(container_client, blob_name: str, data, **kwargs):
+    """
+    Upload one blob, retrying transient failures through scraper.resilience.
+    Existing blobs are overwritten unless `overwrite=False` is passed.
+    """
+    kwargs.setdefault("overwrite", True)
+    blob_client = container_client.get_blob_client(blob_name)
+    call_with_retry(
+        lambda: blob_client.upload_blob(data, **kwargs),
+        host=storage_host(container_client),
+        description=f"upload {container_client.container_name}/{blob_name}",
+    )
+
+def _is_auth_failure(error: HttpResponseError) -> bool:
+    return isinstance(error, ClientAuthenticationError) or error.status_code in (401, 403)
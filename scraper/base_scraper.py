@@ -1,11 +1,76 @@
 # scraper/base_scraper.py
 
+import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime
-from io import BytesIO
-import requests
-from scraper import data_tracker
+from scraper import data_tracker, downloader, scheduler
+from scraper.config import FINAL_DATA_FORMAT, FINAL_DATA_WRITE_MODE
+from scraper.ranges import CellRange, bounding_range, parse_ranges
+from scraper.workbook_cache import open_workbook
+
+def extract_sheet_ranges(excel_content: bytes, requests: dict, content_hash: str = None) -> dict:
+    """
+    Read the ranges in `requests` ({sheet_name: iterable of CellRange})
+    from a workbook, parsing each sheet once.
+
+    A sheet is parsed over the rows spanning all of its ranges and only
+    the columns they cover, and each range is sliced from that window, so
+    another series from an already-read sheet costs almost nothing.
+    Returns {(sheet_name, CellRange): DataFrame}, with None for ranges
+    that could not be read. Tables keep the sheet's row and column
+    positions as labels, as a full-sheet slice would.
+    """
+    workbook = open_workbook(excel_content, content_hash)
+    tables = {}
+    for sheet_name, ranges in requests.items():
+        ranges = sorted(set(ranges))
+        if sheet_name not in workbook.sheet_names:
+            logging.error(f"Sheet '{sheet_name}' not found in workbook")
+            tables.update({(sheet_name, cell_range): None for cell_range in ranges})
+            continue
+        try:
+            window = _read_window(workbook, sheet_name, ranges)
+        except Exception as e:
+            if len(ranges) == 1:
+                logging.error(f"Extraction error for {sheet_name}!{ranges[0]}: {e}")
+                tables[(sheet_name, ranges[0])] = None
+                continue
+            # A range past the sheet's edge fails the shared read; read the
+            # ranges one by one so the valid ones are still extracted
+            logging.warning(f"Reading {len(ranges)} ranges of '{sheet_name}' together failed: {e}")
+            window = None
+        for cell_range in ranges:
+            try:
+                source = window if window is not None else _read_window(workbook, sheet_name, [cell_range])
+                tables[(sheet_name, cell_range)] = _slice_range(source, cell_range)
+            except Exception as e:
+                logging.error(f"Extraction error for {sheet_name}!{cell_range}: {e}")
+                tables[(sheet_name, cell_range)] = None
+    return tables
+
+def _read_window(workbook: pd.ExcelFile, sheet_name: str, ranges: list) -> pd.DataFrame:
+    """Parse the rows spanning `ranges` and the columns they cover, labelled by sheet position."""
+    bounds = bounding_range(ranges)
+    columns = sorted({col for cell_range in ranges for col in range(cell_range.start_col, cell_range.end_col + 1)})
+    window = workbook.parse(
+        sheet_name=sheet_name,
+        header=None,
+        skiprows=bounds.start_row,
+        nrows=bounds.n_rows,
+        usecols=columns,
+    )
+    window.index = range(bounds.start_row, bounds.start_row + len(window))
+    window.columns = columns
+    return window
+
+def _slice_range(window: pd.DataFrame, cell_range: CellRange) -> pd.DataFrame:
+    """Cut `cell_range` out of a window, or return None if the sheet does not cover it."""
+    table = window.loc[cell_range.start_row:cell_range.end_row, cell_range.start_col:cell_range.end_col]
+    if table.shape != (cell_range.n_rows, cell_range.n_cols):
+        logging.error(f"Invalid data location: {cell_range} for sheet window of shape {table.shape}")
+        return None
+    return table.copy()
 
 class BaseEDBScraper:
     """Base class for Economic Development Bank scrapers"""
@@ -20,79 +85,169 @@ class BaseEDBScraper:
         """Process raw data into a standardized format (to be implemented in subclass)"""
         raise NotImplementedError
 
-    def insert_data(self, data: pd.DataFrame) -> None:
+    def insert_data(self, data: pd.DataFrame) -> dict:
         """Upload processed data to the Data Lake using the azure_blob uploader"""
         from scraper import azure_blob
-        # Save the processed data as CSV under the given table_name.
-        azure_blob.upload_final_data(data, self.config['table_name'])
+        # Save the processed data under the given table_name in the configured
+        # format, rewriting the whole series or only the changed rows depending
+        # on the configured write mode.
+        write_mode = self.config.get('write_mode', FINAL_DATA_WRITE_MODE)
+        output_format = self.config.get('output_format', FINAL_DATA_FORMAT)
+        value_type = self.config.get('value_type', 'float')
+        return azure_blob.upload_final_data(data, self.config['table_name'], write_mode, output_format, value_type)
 
     def download_excel(self, url: str, file_name: str) -> bytes:
         """Download Excel file from a specified URL"""
+        result = self.fetch_excel(url, file_name)
+        return result["content"] if result else None
+
+    def fetch_excel(self, url: str, file_name: str, etag: str = None, last_modified: str = None) -> dict:
+        """
+        Download an Excel file, sending If-None-Match/If-Modified-Since when
+        validators from a previous run are given.
+
+        Returns a dict with the keys content, not_modified, etag,
+        last_modified and content_hash, or None if the download failed.
+        On a 304 response content is None and the given validators are
+        passed through.
+        """
         full_url = url + file_name
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
         try:
-            response = requests.get(full_url)
-            response.raise_for_status()
-            return response.content
+            response = downloader.download(full_url, headers=headers)
+            if response["status_code"] == 304:
+                logging.info(f"{file_name} not modified since last run")
+                return {
+                    "content": None,
+                    "not_modified": True,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "content_hash": None,
+                }
+            return {
+                "content": response["content"],
+                "not_modified": False,
+                "etag": response["headers"].get("ETag"),
+                "last_modified": response["headers"].get("Last-Modified"),
+                "content_hash": response["content_hash"],
+            }
         except Exception as e:
             logging.error(f"Download error: {e}")
             return None
 
-    def extract_data(self, excel_content: bytes, sheet_name: str, data_location: str) -> pd.DataFrame:
-        try:
-            # Try to read with sheet name first
-            df = pd.read_excel(BytesIO(excel_content), sheet_name=sheet_name, header=None)
-            
-            # Extract cell range
-            start_cell, end_cell = data_location.split(":")
-            start_row = int(start_cell[1:]) - 1
-            start_col = ord(start_cell[0].upper()) - ord('A')
-            end_row = int(end_cell[1:]) - 1
-            end_col = ord(end_cell[0].upper()) - ord('A')
-            
-            # Validate extraction boundaries
-            if start_row < 0 or start_col < 0 or end_row >= df.shape[0] or end_col >= df.shape[1]:
-                logging.error(f"Invalid data location: {data_location} for dataframe of shape {df.shape}")
-                return None
-                
-            return df.iloc[start_row:end_row + 1, start_col:end_col + 1]
-        except ValueError as ve:
-            # Specific handling for sheet name errors
-            logging.error(f"Sheet '{sheet_name}' not found: {ve}")
+    def extract_data(self, excel_content: bytes, sheet_name: str, data_location: str,
+                     content_hash: str = None) -> pd.DataFrame:
+        """
+        Extract the single range `data_location` from `sheet_name`. Pass the
+        file's `content_hash` when already known to skip rehashing it for
+        the workbook cache. Use extract_tables for multi-range locations.
+        """
+        tables = self.extract_tables(excel_content, sheet_name, data_location, content_hash)
+        if tables is None:
             return None
+        if len(tables) != 1:
+            logging.error(f"Data location {data_location} names {len(tables)} ranges, expected one")
+            return None
+        return tables[0]
+
+    def extract_tables(self, excel_content: bytes, sheet_name: str, data_location,
+                       content_hash: str = None) -> list:
+        """
+        Extract every range of `data_location` (see ranges.parse_ranges)
+        from `sheet_name`, parsing the sheet once. Returns one DataFrame per
+        range in the configured order, or None if any range failed.
+        """
+        try:
+            ranges = parse_ranges(data_location)
+            tables = extract_sheet_ranges(excel_content, {sheet_name: ranges}, content_hash)
         except Exception as e:
             logging.error(f"Extraction error: {e}")
             return None
+        selected = [tables[(sheet_name, cell_range)] for cell_range in ranges]
+        return None if any(table is None for table in selected) else selected
+
+    def process_tables(self, tables: list) -> pd.DataFrame:
+        """
+        Process each extracted range with process_data and combine them.
+        Where ranges cover the same dates the later range wins, so a
+        sheet's current-year table can overlay its history.
+        """
+        if len(tables) == 1:
+            return self.process_data(tables[0])
+        combined = pd.concat([self.process_data(table) for table in tables], ignore_index=True)
+        if 'Date' not in combined.columns:
+            return combined
+        combined = combined.drop_duplicates(subset='Date', keep='last')
+        return combined.sort_values(by='Date').reset_index(drop=True)
+
+    def update_last_run(self, dataset_name: str, validators: dict = None) -> None:
+        """
+        Update the timestamp of the last scraper run using data_tracker,
+        storing the source file's etag, last_modified and content_hash
+        from `validators` when given.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        validators = validators or {}
+        data_tracker.update_last_run(
+            dataset_name,
+            timestamp,
+            etag=validators.get("etag"),
+            last_modified=validators.get("last_modified"),
+            content_hash=validators.get("content_hash"),
+        )
 
-    def update_last_run(self, dataset_name: str) -> None:
-        """Update the timestamp of the last scraper run using data_tracker"""
+    def build_run_record(self, dataset_name: str, validators: dict = None) -> dict:
+        """Build the last-run record for `dataset_name` without writing it, for batched commits"""
         timestamp = datetime.utcnow().isoformat()
-        data_tracker.update_last_run(dataset_name, timestamp)
+        validators = validators or {}
+        return data_tracker.build_run_entity(
+            dataset_name,
+            timestamp,
+            etag=validators.get("etag"),
+            last_modified=validators.get("last_modified"),
+            content_hash=validators.get("content_hash"),
+        )
 
     def get_last_run(self, dataset_name: str):
         """Get the timestamp of the last scraper run using data_tracker"""
         return data_tracker.get_last_run(dataset_name)
 
+    def get_run_metadata(self, dataset_name: str):
+        """Get the last run record, including source file validators, using data_tracker"""
+        return data_tracker.get_run_metadata(dataset_name)
+
     def should_update(self, dataset_name: str, update_frequency_hours: int = 24) -> bool:
         """Determine if an update is needed based on the last run"""
-        last_run = self.get_last_run(dataset_name)
-        if not last_run:
-            return True
-        now = datetime.utcnow()
-        hours_since_update = (now - last_run).total_seconds() / 3600
-        return hours_since_update >= update_frequency_hours
+        return self.is_due(self.get_last_run(dataset_name), update_frequency_hours)
+
+    def is_due(self, last_run, update_frequency_hours: int = 24) -> bool:
+        """Determine if a dataset last run at `last_run` is due for an update"""
+        return scheduler.is_due(last_run, update_frequency_hours)
+
+# Fiscal-year month names and their calendar month numbers. Month labels are
+# mapped to positions in this list through a categorical lookup.
+FISCAL_MONTHS = [
+    'July', 'August', 'September', 'October', 'November', 'December',
+    'January', 'February', 'March', 'April', 'May', 'June'
+]
+FISCAL_MONTH_NUMBERS = np.array([7, 8, 9, 10, 11, 12, 1, 2, 3, 4, 5, 6])
 
 # Example implementation for monthly data.
 class MonthlyDataScraper(BaseEDBScraper):
     def process_data(self, df: pd.DataFrame) -> pd.DataFrame:
         # Set fiscal years as column headers.
-        df.columns = ['Month'] + [int(year) for year in df.iloc[0, 1:]]
+        df = df.set_axis(['Month'] + [int(year) for year in df.iloc[0, 1:]], axis=1)
         df = df.iloc[1:].reset_index(drop=True)
         
         # Transform from wide to long format.
         df_melted = pd.melt(df, id_vars=['Month'], var_name='Year', value_name=self.config['value_column'])
         
         # Create dates from month names and fiscal years.
-        df_melted['Date'] = df_melted.apply(self._create_date, axis=1)
+        df_melted['Date'] = self._create_dates(df_melted['Month'], df_melted['Year'])
         df_melted = df_melted.dropna(subset=['Date'])
         df_melted = df_melted.sort_values(by='Date').reset_index(drop=True)
         
@@ -102,23 +257,27 @@ class MonthlyDataScraper(BaseEDBScraper):
             df_melted = df_melted.dropna(subset=[self.config['value_column']])
             df_melted[self.config['value_column']] = df_melted[self.config['value_column']].round().astype(int)
         else:
+            # A range of whole numbers parses as integers; keep float series float
             df_melted[self.config['value_column']] = pd.to_numeric(df_melted[self.config['value_column']], errors='coerce')
             df_melted = df_melted.dropna(subset=[self.config['value_column']])
+            df_melted[self.config['value_column']] = df_melted[self.config['value_column']].astype(float)
         
         return df_melted[['Date', self.config['value_column']]]
 
-    def _create_date(self, row: pd.Series):
-        month_mapping = {
-            'July': 7, 'August': 8, 'September': 9, 'October': 10,
-            'November': 11, 'December': 12, 'January': 1, 'February': 2,
-            'March': 3, 'April': 4, 'May': 5, 'June': 6
-        }
-        month_num = month_mapping.get(row['Month'])
-        if not month_num:
-            return None
-        year = int(row['Year'])
-        # For fiscal data, use the previous year for months July-December.
-        if month_num >= 7:
-            return pd.to_datetime(f'{year - 1}-{month_num}-01')
-        else:
-            return pd.to_datetime(f'{year}-{month_num}-01')
\ No newline at end of file
+    def _create_dates(self, months: pd.Series, years: pd.Series) -> pd.Series:
+        """
+        Build first-of-month dates for fiscal-year month names in one pass.
+
+        Rows whose month name is not recognised get NaT. For fiscal data
+        the months July-December belong to the previous calendar year.
+        """
+        codes = pd.Categorical(months, categories=FISCAL_MONTHS).codes
+        valid = codes >= 0
+        month_numbers = FISCAL_MONTH_NUMBERS[codes[valid]]
+        calendar_years = years.to_numpy()[valid].astype(int) - (month_numbers >= 7)
+
+        dates = pd.Series(pd.NaT, index=months.index, dtype='datetime64[ns]')
+        dates[valid] = pd.to_datetime(
+            pd.DataFrame({'year': calendar_years, 'month': month_numbers, 'day': 1})
+        ).to_numpy()
+        return dates
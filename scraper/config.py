@@ -2,10 +2,67 @@
 Configuration for all EDB data scrapers.
 """
 import os
+from scraper.ranges import parse_ranges
 
 # Base URL from environment variable with fallback
 BASE_URL = os.getenv("EDB_BASE_URL", "https://www.bde.pr.gov/BDE/PREDDOCS/")
 
+# How long the storage connection string is cached before Key Vault is asked again
+CONNECTION_STRING_TTL_SECONDS = int(os.getenv("CONNECTION_STRING_TTL_SECONDS", "3600"))
+
+# How processed series are written unless a config sets 'write_mode':
+# "full" rewrites {table_name}.csv, "incremental" only rewrites the years whose
+# rows changed, tracked by a small per-year digest
+FINAL_DATA_WRITE_MODE = os.getenv("FINAL_DATA_WRITE_MODE", "full")
+
+# Processed-data file format unless a config sets 'output_format' ("csv" or
+# "parquet"), and the compression codec used for Parquet files
+FINAL_DATA_FORMAT = os.getenv("FINAL_DATA_FORMAT", "csv")
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+# Number of source files processed concurrently in one run
+SCRAPER_MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "4"))
+
+# A source file is not started unless at least this much of the run deadline remains
+SCHEDULER_MIN_FILE_SECONDS = float(os.getenv("SCHEDULER_MIN_FILE_SECONDS", "30"))
+
+# Source file downloads (scraper/downloader.py)
+DOWNLOAD_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT_SECONDS", "10"))
+DOWNLOAD_READ_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_READ_TIMEOUT_SECONDS", "30"))
+DOWNLOAD_TOTAL_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TOTAL_TIMEOUT_SECONDS", "120"))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(64 * 1024)))
+
+# Retry/backoff and circuit breaker settings shared by downloads and storage calls
+# (scraper/resilience.py). Retries never run past functionTimeout in host.json
+# minus RUN_DEADLINE_MARGIN_SECONDS.
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+RUN_DEADLINE_MARGIN_SECONDS = float(os.getenv("RUN_DEADLINE_MARGIN_SECONDS", "30"))
+
+# Limits for the in-process cache of parsed workbooks (scraper/workbook_cache.py)
+WORKBOOK_CACHE_MAX_ENTRIES = int(os.getenv("WORKBOOK_CACHE_MAX_ENTRIES", "4"))
+WORKBOOK_CACHE_MAX_BYTES = int(os.getenv("WORKBOOK_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Storage queue of per-source-file work items used by the orchestrator mode.
+# Must match queueName in QueueWorkerScraper/function.json.
+WORK_QUEUE_NAME = os.getenv("WORK_QUEUE_NAME", "scraper-work")
+
+# Per-file leases so overlapping runs do not process the same source file
+# (scraper/leases.py). A lease left by a crashed run expires after
+# LEASE_DURATION_SECONDS. Leases are kept in ScraperMetadata unless
+# LEASE_DIRECTORY names a local directory, which is meant for local runs and
+# tests. Set LEASES_ENABLED=false to turn leasing off.
+LEASES_ENABLED = os.getenv("LEASES_ENABLED", "true").lower() in ("1", "true", "yes")
+LEASE_DURATION_SECONDS = float(os.getenv("LEASE_DURATION_SECONDS", "360"))
+LEASE_DIRECTORY = os.getenv("LEASE_DIRECTORY", "")
+
+# Per-stage timing, byte and row counts for each run (scraper/metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
 # Common SQL template for creating monthly data tables
 MONTHLY_TABLE_SQL_TEMPLATE = """
 CREATE TABLE IF NOT EXISTS {table_name} (
@@ -26,7 +83,12 @@ CREATE TABLE IF NOT EXISTS {table_name} (
 CREATE INDEX IF NOT EXISTS idx_{table_name}_date ON {table_name} (date);
 """
 
-# Definition of all scrapers
+# Definition of all scrapers. Besides the keys used below, a config may set
+# 'output_format' ("csv" or "parquet") and 'write_mode' ("full" or
+# "incremental") to override FINAL_DATA_FORMAT and FINAL_DATA_WRITE_MODE.
+# 'data_location' takes any A1 range ('A6:K18', 'AA10:BC40'), or several as a
+# list or comma-separated string when a sheet splits a series across tables;
+# those are combined by date, later ranges winning (see scraper/ranges.py).
 SCRAPER_CONFIGS = {
     # Monthly data scrapers
     'auto_sales': {
@@ -242,5 +304,13 @@ SCRAPER_CONFIGS = {
 for config in SCRAPER_CONFIGS.values():
     config['url'] = BASE_URL
 
+# Parse every data_location now, so a malformed range fails at load time and
+# runs reuse the cached parse
+for name, config in SCRAPER_CONFIGS.items():
+    try:
+        parse_ranges(config['data_location'])
+    except ValueError as e:
+        raise ValueError(f"Invalid data_location for scraper {name}: {e}") from e
+
 # Define which tables need to be created (used in your local or Supabase setup)
 TABLES_TO_CREATE = [config['create_table_sql'] for config in SCRAPER_CONFIGS.values()]
\ No newline at end of file
@@ -1,39 +1,248 @@
 # scraper/data_tracker.py
 import os
+import json
 import logging
-from datetime import datetime
-from azure.data.tables import TableServiceClient, TableClient
-from azure.core.exceptions import ResourceExistsError
+from datetime import datetime, timedelta
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError,
+)
+from azure.data.tables import UpdateMode
+from scraper.resilience import call_with_retry
+from scraper.storage_clients import ensure_table, invalidate_table, storage_host
 
 connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 table_name = "ScraperMetadata"
+PARTITION_KEY = "scraper"
+
+# A single row in its own partition lists scrapers left pending by the last run
+CHECKPOINT_PARTITION_KEY = "checkpoint"
+CHECKPOINT_ROW_KEY = "pending"
+
+# Leases on source files live in their own partition, one row per file
+LEASE_PARTITION_KEY = "lease"
+
+# Azure Tables accepts at most 100 operations per transaction
+MAX_BATCH_SIZE = 100
 
 def _get_table_client():
-    service = TableServiceClient.from_connection_string(conn_str=connection_string)
-    try:
-        service.create_table(table_name)
-    except ResourceExistsError:
-        # Table already exists - this is expected
-        pass
-    except Exception as e:
-        logging.error(f"Error creating table {table_name}: {str(e)}")
-    return service.get_table_client(table_name)
+    # The table is created at most once per process (see storage_clients.ensure_table)
+    return ensure_table(connection_string, table_name)
 
-def update_last_run(dataset_name: str, timestamp: str) -> None:
+def _call_table(operation: str, func):
+    """Run `func(table_client)`, retrying transient failures through scraper.resilience."""
     table_client = _get_table_client()
+    return call_with_retry(
+        lambda: func(table_client),
+        host=storage_host(table_client),
+        description=f"{operation} on {table_name}",
+    )
+
+def _upsert_entity(entity: dict) -> None:
+    """Upsert `entity`, recreating the table once if it has been deleted."""
+    def upsert(table_client):
+        table_client.upsert_entity(entity, mode="replace")
+
+    try:
+        _call_table("upsert", upsert)
+    except ResourceNotFoundError:
+        logging.warning(f"Table {table_name} not found, recreating it")
+        invalidate_table(connection_string, table_name)
+        _call_table("upsert", upsert)
+
+def build_run_entity(dataset_name: str, timestamp: str, etag: str = None,
+                     last_modified: str = None, content_hash: str = None) -> dict:
+    """Build the ScraperMetadata entity recording a run of `dataset_name`."""
     entity = {
-        "PartitionKey": "scraper",
+        "PartitionKey": PARTITION_KEY,
         "RowKey": dataset_name,
         "timestamp": timestamp
     }
-    table_client.upsert_entity(entity, mode="replace")
+    if etag:
+        entity["etag"] = etag
+    if last_modified:
+        entity["last_modified"] = last_modified
+    if content_hash:
+        entity["content_hash"] = content_hash
+    return entity
+
+def update_last_run(dataset_name: str, timestamp: str, etag: str = None,
+                    last_modified: str = None, content_hash: str = None) -> None:
+    """
+    Record a run of `dataset_name`, along with the HTTP validators and
+    content hash of the source file it was processed from.
+    """
+    entity = build_run_entity(dataset_name, timestamp, etag, last_modified, content_hash)
+    _upsert_entity(entity)
     logging.info(f"Updated last run for {dataset_name} to {timestamp}")
 
-def get_last_run(dataset_name: str):
-    table_client = _get_table_client()
+def update_runs(entities: list) -> list:
+    """
+    Commit many run records (see build_run_entity) at once.
+
+    All records share one partition, so they are written with
+    submit_transaction in batches of up to 100. If a batch fails its
+    records are written one by one instead. Returns the names of the
+    datasets that could not be recorded.
+    """
+    failed = []
+    for start in range(0, len(entities), MAX_BATCH_SIZE):
+        batch = entities[start:start + MAX_BATCH_SIZE]
+        try:
+            operations = [("upsert", entity, {"mode": UpdateMode.REPLACE}) for entity in batch]
+            _call_table("transaction", lambda table_client: table_client.submit_transaction(operations))
+            logging.info(f"Updated last run for {len(batch)} datasets in one transaction")
+            continue
+        except Exception as e:
+            logging.warning(f"Batch update of {len(batch)} run records failed, writing individually: {str(e)}")
+
+        for entity in batch:
+            try:
+                _upsert_entity(entity)
+            except Exception as e:
+                logging.error(f"Error updating last run for {entity['RowKey']}: {str(e)}")
+                failed.append(entity["RowKey"])
+    return failed
+
+def get_run_metadata(dataset_name: str):
+    """
+    Return the last run record for `dataset_name` as a dict with the
+    keys timestamp (datetime), etag, last_modified and content_hash,
+    or None if the dataset has never run.
+    """
     try:
-        entity = table_client.get_entity("scraper", dataset_name)
-        return datetime.fromisoformat(entity["timestamp"])
+        entity = _call_table("get", lambda table_client: table_client.get_entity(PARTITION_KEY, dataset_name))
+        return _to_run_metadata(entity)
     except Exception as e:
         logging.info(f"No previous run found for {dataset_name}: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def get_all_run_metadata() -> dict:
+    """
+    Load the last run record of every dataset with a single partition
+    query, keyed by dataset name. Datasets that never ran are absent.
+    """
+    return _query_run_metadata(f"PartitionKey eq '{PARTITION_KEY}'")
+
+def get_run_metadata_for(dataset_names: list) -> dict:
+    """
+    Load the last run records of `dataset_names` with a single query,
+    keyed by dataset name. Datasets that never ran are absent.
+    """
+    row_keys = " or ".join(f"RowKey eq '{_quote(name)}'" for name in dataset_names)
+    return _query_run_metadata(f"PartitionKey eq '{PARTITION_KEY}' and ({row_keys})")
+
+def _query_run_metadata(query: str) -> dict:
+    # Materialise the pages inside the retry so paging errors are retried too
+    entities = _call_table("query", lambda table_client: list(table_client.query_entities(query)))
+    return {entity["RowKey"]: _to_run_metadata(entity) for entity in entities}
+
+def _quote(value: str) -> str:
+    """Escape a string literal for an OData filter."""
+    return value.replace("'", "''")
+
+def get_last_run(dataset_name: str):
+    metadata = get_run_metadata(dataset_name)
+    return metadata["timestamp"] if metadata else None
+
+def save_checkpoint(pending: list) -> None:
+    """Record the scrapers a run did not finish, so the next run starts with them."""
+    entity = {
+        "PartitionKey": CHECKPOINT_PARTITION_KEY,
+        "RowKey": CHECKPOINT_ROW_KEY,
+        "scrapers": json.dumps(pending),
+        "saved_at": datetime.utcnow().isoformat()
+    }
+    _upsert_entity(entity)
+    logging.info(f"Saved checkpoint with {len(pending)} pending scrapers")
+
+def load_checkpoint() -> list:
+    """Return the scrapers left pending by the previous run, oldest first."""
+    try:
+        entity = _call_table(
+            "get", lambda table_client: table_client.get_entity(CHECKPOINT_PARTITION_KEY, CHECKPOINT_ROW_KEY)
+        )
+    except ResourceNotFoundError:
+        return []
+    return json.loads(entity.get("scrapers") or "[]")
+
+def _to_run_metadata(entity) -> dict:
+    return {
+        "timestamp": datetime.fromisoformat(entity["timestamp"]),
+        "etag": entity.get("etag"),
+        "last_modified": entity.get("last_modified"),
+        "content_hash": entity.get("content_hash"),
+    }
+
+def acquire_lease(name: str, owner: str, duration_seconds: float):
+    """
+    Try to claim the lease `name` for `owner` until `duration_seconds` from now.
+
+    The lease row is created if absent. An existing row is only taken over
+    once it has expired, with a conditional replace on the ETag that was
+    read, so of several instances racing for an expired lease exactly one
+    wins. Returns the lease row's ETag if `owner` now holds the lease,
+    or None; pass it to release_lease to release without reading the row.
+    """
+    expires_at = (datetime.utcnow() + timedelta(seconds=duration_seconds)).isoformat()
+    entity = {"PartitionKey": LEASE_PARTITION_KEY, "RowKey": name, "owner": owner, "expires_at": expires_at}
+    try:
+        created = _call_table("create lease", lambda table_client: table_client.create_entity(entity))
+        return (created or {}).get("etag", "")
+    except ResourceExistsError:
+        pass
+
+    try:
+        current = _call_table("get lease", lambda table_client: table_client.get_entity(LEASE_PARTITION_KEY, name))
+    except ResourceNotFoundError:
+        # Released between our create and read; the next attempt can create it
+        return None
+    if current.get("owner") == owner:
+        # A retried create whose first attempt had already succeeded
+        return current.metadata["etag"]
+    if datetime.fromisoformat(current["expires_at"]) > datetime.utcnow():
+        return None
+
+    try:
+        replaced = _call_table("take over lease", lambda table_client: table_client.update_entity(
+            entity, mode=UpdateMode.REPLACE, etag=current.metadata["etag"],
+            match_condition=MatchConditions.IfNotModified,
+        ))
+    except (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError):
+        return None
+    except HttpResponseError as e:
+        if e.status_code in (404, 409, 412):
+            return None
+        raise
+    logging.info(f"Took over expired lease on {name} from {current.get('owner')}")
+    return (replaced or {}).get("etag", "")
+
+def release_lease(name: str, owner: str, etag: str = None) -> None:
+    """
+    Release the lease `name` if `owner` still holds it. With the `etag`
+    returned by acquire_lease the row is deleted on that ETag directly;
+    if the lease has since been taken over the delete is refused.
+    """
+    if etag:
+        _delete_lease(name, etag)
+        return
+    try:
+        current = _call_table("get lease", lambda table_client: table_client.get_entity(LEASE_PARTITION_KEY, name))
+    except ResourceNotFoundError:
+        return
+    if current.get("owner") != owner:
+        logging.warning(f"Lease on {name} is now held by {current.get('owner')}, not releasing it")
+        return
+    _delete_lease(name, current.metadata["etag"])
+
+def _delete_lease(name: str, etag: str) -> None:
+    """Delete the lease row `name` unless it has changed since `etag`."""
+    try:
+        _call_table("release lease", lambda table_client: table_client.delete_entity(
+            LEASE_PARTITION_KEY, name, etag=etag, match_condition=MatchConditions.IfNotModified,
+        ))
+    except (ResourceModifiedError, ResourceNotFoundError):
+        logging.warning(f"Lease on {name} was taken over or removed, not releasing it")
+    except HttpResponseError as e:
+        if e.status_code not in (404, 412):
+            raise
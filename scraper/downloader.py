@@ -0,0 +1,113 @@
+# scraper/downloader.py
+
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from scraper.config import (
+    DOWNLOAD_CHUNK_BYTES,
+    DOWNLOAD_CONNECT_TIMEOUT_SECONDS,
+    DOWNLOAD_MAX_BYTES,
+    DOWNLOAD_READ_TIMEOUT_SECONDS,
+    DOWNLOAD_TOTAL_TIMEOUT_SECONDS,
+    SCRAPER_MAX_WORKERS,
+)
+from scraper.resilience import call_with_retry
+
+class DownloadTooLargeError(Exception):
+    """Raised when a response exceeds DOWNLOAD_MAX_BYTES."""
+
+class DownloadTimeoutError(Exception):
+    """Raised when a download takes longer than DOWNLOAD_TOTAL_TIMEOUT_SECONDS."""
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide keep-alive session, sized so every concurrent
+    source file pipeline can hold its own pooled connection.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(SCRAPER_MAX_WORKERS, 1))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def download(url: str, headers: dict = None) -> dict:
+    """
+    Stream `url` in DOWNLOAD_CHUNK_BYTES chunks, hashing the bytes as they
+    arrive, and join the chunks once at the end.
+
+    Responses larger than DOWNLOAD_MAX_BYTES are rejected, from the
+    Content-Length header when sent or else once the limit is crossed, so
+    a download holds at most that much in memory (twice that briefly
+    while the chunks are joined). Connect and
+    read timeouts apply to each socket operation, and the whole transfer
+    is capped at DOWNLOAD_TOTAL_TIMEOUT_SECONDS so a slow server cannot
+    hold the worker until the function timeout.
+
+    Connection errors, timeouts, throttling and 5xx responses are retried
+    with backoff through scraper.resilience, subject to the host's circuit
+    breaker.
+
+    Returns a dict with the keys status_code, content, headers, size and
+    content_hash (SHA-256 hex). For a 304 response content and
+    content_hash are None. HTTP errors are raised as requests exceptions.
+    """
+    return call_with_retry(
+        lambda: _download_once(url, headers),
+        host=urlparse(url).netloc,
+        description=f"GET {url}",
+    )
+
+def _download_once(url: str, headers: dict = None) -> dict:
+    started = time.monotonic()
+    timeout = (DOWNLOAD_CONNECT_TIMEOUT_SECONDS, DOWNLOAD_READ_TIMEOUT_SECONDS)
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return {
+                "status_code": 304,
+                "content": None,
+                "headers": response.headers,
+                "size": 0,
+                "content_hash": None,
+            }
+        response.raise_for_status()
+
+        declared_size = response.headers.get("Content-Length")
+        if declared_size and declared_size.isdigit() and int(declared_size) > DOWNLOAD_MAX_BYTES:
+            raise DownloadTooLargeError(
+                f"{url} is {declared_size} bytes, above the {DOWNLOAD_MAX_BYTES} byte limit"
+            )
+
+        digest = hashlib.sha256()
+        size = 0
+        chunks = []
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > DOWNLOAD_MAX_BYTES:
+                raise DownloadTooLargeError(f"{url} exceeded the {DOWNLOAD_MAX_BYTES} byte limit")
+            if time.monotonic() - started > DOWNLOAD_TOTAL_TIMEOUT_SECONDS:
+                raise DownloadTimeoutError(
+                    f"{url} took longer than {DOWNLOAD_TOTAL_TIMEOUT_SECONDS} seconds"
+                )
+            digest.update(chunk)
+            chunks.append(chunk)
+        content = b"".join(chunks)
+
+    logging.info(f"Downloaded {size} bytes from {url} in {time.monotonic() - started:.2f}s")
+    return {
+        "status_code": response.status_code,
+        "content": content,
+        "headers": response.headers,
+        "size": size,
+        "content_hash": digest.hexdigest(),
+    }
@@ -0,0 +1,161 @@
+# scraper/leases.py
+
+import contextlib
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from scraper.config import LEASE_DIRECTORY, LEASE_DURATION_SECONDS, LEASES_ENABLED
+
+# A steal marker older than this is left over from a crash and may be removed
+STALE_STEAL_SECONDS = 30
+
+class TableLeaseStore:
+    """
+    Leases kept as rows of the ScraperMetadata table, guarded by ETags.
+    The ETag of each lease acquired is remembered so releasing it is a
+    single conditional delete.
+    """
+    def __init__(self):
+        self._etags = {}
+
+    def acquire(self, name: str, owner: str, duration_seconds: float) -> bool:
+        from scraper import data_tracker
+        etag = data_tracker.acquire_lease(name, owner, duration_seconds)
+        if etag is None:
+            return False
+        self._etags[(name, owner)] = etag
+        return True
+
+    def release(self, name: str, owner: str) -> None:
+        from scraper import data_tracker
+        data_tracker.release_lease(name, owner, self._etags.pop((name, owner), None))
+
+class LocalLeaseStore:
+    """
+    Leases kept as files in a local directory, for local runs and for
+    testing contention between processes.
+
+    A lease is a {name}.lease file created with O_CREAT | O_EXCL, so only
+    one process can create it. Taking over an expired lease, and releasing
+    one, happens while holding a {name}.steal marker that is itself created
+    exclusively, so the lease file is never replaced under a reader.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def acquire(self, name: str, owner: str, duration_seconds: float) -> bool:
+        expires_at = (datetime.utcnow() + timedelta(seconds=duration_seconds)).isoformat()
+        content = json.dumps({"owner": owner, "expires_at": expires_at})
+        if self._create(self._path(name), content):
+            return True
+
+        with self._steal_marker(name) as acquired:
+            if not acquired:
+                return False
+            current = self._read(name)
+            if current is None:
+                # Released meanwhile; compete for it like any other creator
+                return self._create(self._path(name), content)
+            if datetime.fromisoformat(current["expires_at"]) > datetime.utcnow():
+                return False
+            # Write the new lease beside the old one and swap it in atomically
+            temporary = f"{self._path(name)}.{owner}.tmp"
+            with open(temporary, "w") as f:
+                f.write(content)
+            os.replace(temporary, self._path(name))
+            logging.info(f"Took over expired lease on {name} from {current.get('owner')}")
+            return True
+
+    def release(self, name: str, owner: str) -> None:
+        with self._steal_marker(name, wait=True) as acquired:
+            current = self._read(name)
+            if acquired and current is not None and current.get("owner") == owner:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._path(name))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.lease")
+
+    def _read(self, name: str):
+        try:
+            with open(self._path(name)) as f:
+                return json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _create(path: str, content: str) -> bool:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        return True
+
+    @contextlib.contextmanager
+    def _steal_marker(self, name: str, wait: bool = False):
+        """Hold {name}.steal while inspecting or replacing a lease; yields whether it was acquired."""
+        marker = os.path.join(self.directory, f"{name}.steal")
+        deadline = time.monotonic() + STALE_STEAL_SECONDS
+        while not self._create(marker, str(os.getpid())):
+            with contextlib.suppress(FileNotFoundError):
+                if time.time() - os.path.getmtime(marker) > STALE_STEAL_SECONDS:
+                    os.remove(marker)
+                    continue
+            if not wait or time.monotonic() > deadline:
+                yield False
+                return
+            time.sleep(0.01)
+        try:
+            yield True
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(marker)
+
+def get_lease_store():
+    """Return the configured lease store, or None when leasing is disabled."""
+    if not LEASES_ENABLED:
+        return None
+    if LEASE_DIRECTORY:
+        return LocalLeaseStore(LEASE_DIRECTORY)
+    return TableLeaseStore()
+
+def new_owner() -> str:
+    """Return a lease owner id unique to one claim, naming the host and process for debugging."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+@contextlib.contextmanager
+def claim(name: str, store=None, duration_seconds: float = None):
+    """
+    Hold the lease `name` for the enclosed block; yields whether it was
+    acquired. With leasing disabled every claim succeeds. A failure to
+    reach the lease store is logged and treated as acquired, so a storage
+    problem does not stop all work.
+    """
+    store = store if store is not None else get_lease_store()
+    if store is None:
+        yield True
+        return
+
+    owner = new_owner()
+    try:
+        acquired = store.acquire(name, owner, duration_seconds or LEASE_DURATION_SECONDS)
+    except Exception as e:
+        logging.warning(f"Could not acquire lease on {name}, continuing without it: {str(e)}")
+        yield True
+        return
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                store.release(name, owner)
+            except Exception as e:
+                logging.warning(f"Could not release lease on {name}, it will expire: {str(e)}")
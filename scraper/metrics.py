@@ -0,0 +1,140 @@
+# scraper/metrics.py
+
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+from scraper.config import METRICS_ENABLED
+
+# The recorder for the current run and the innermost open span. Worker
+# threads see the recorder when their job runs in a copy of the caller's
+# context (see pipeline.run_source_files).
+_recorder = contextvars.ContextVar("metrics_recorder", default=None)
+_active_span = contextvars.ContextVar("metrics_span", default=None)
+
+class Span:
+    """Wall time, bytes, rows and retries for one stage of a run."""
+    __slots__ = ("stage", "scraper", "source", "seconds", "bytes_in", "bytes_out", "rows", "retries", "error")
+
+    def __init__(self, stage: str, scraper: str = None, source: str = None):
+        self.stage = stage
+        self.scraper = scraper
+        self.source = source
+        self.seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rows = 0
+        self.retries = 0
+        self.error = False
+
+    def set(self, bytes_in: int = None, bytes_out: int = None, rows: int = None) -> None:
+        if bytes_in is not None:
+            self.bytes_in = bytes_in
+        if bytes_out is not None:
+            self.bytes_out = bytes_out
+        if rows is not None:
+            self.rows = rows
+
+class _NoopSpan:
+    """Stands in for a span when metrics are disabled."""
+    def set(self, bytes_in: int = None, bytes_out: int = None, rows: int = None) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class MetricsRecorder:
+    """Collects the spans of one run, from any number of threads."""
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        """
+        Aggregate the spans by stage, by scraper and by source file. Each
+        entry holds count, seconds, bytes_in, bytes_out, rows, retries and
+        errors.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        summary = {"stages": {}, "scrapers": {}, "sources": {}}
+        for span in spans:
+            _add(summary["stages"].setdefault(span.stage, _empty_totals()), span)
+            if span.scraper:
+                _add(summary["scrapers"].setdefault(span.scraper, {}).setdefault(span.stage, _empty_totals()), span)
+            elif span.source:
+                _add(summary["sources"].setdefault(span.source, {}).setdefault(span.stage, _empty_totals()), span)
+        for totals in _iter_totals(summary):
+            totals["seconds"] = round(totals["seconds"], 4)
+        return summary
+
+@contextlib.contextmanager
+def recording():
+    """
+    Collect spans for the enclosed run in the current context. Yields the
+    recorder, or None when METRICS_ENABLED is off, in which case span()
+    does nothing. The previous recorder is restored on exit, so spans from
+    later work on the same thread are not added to a finished run.
+    """
+    recorder = MetricsRecorder() if METRICS_ENABLED else None
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+@contextlib.contextmanager
+def span(stage: str, scraper: str = None, source: str = None):
+    """
+    Time the enclosed block as `stage`. The yielded span takes byte and row
+    counts through set(); retries made inside the block are counted on it.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield _NOOP_SPAN
+        return
+    current = Span(stage, scraper, source)
+    token = _active_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        current.seconds = time.perf_counter() - started
+        _active_span.reset(token)
+        recorder.record(current)
+
+def record_retry() -> None:
+    """Count a retry against the innermost open span, if any."""
+    current = _active_span.get()
+    if current is not None:
+        current.retries += 1
+
+def log_summary(summary: dict) -> None:
+    """Emit the run summary as one JSON log line with a fixed prefix, for querying in Application Insights."""
+    logging.info(f"scraper_metrics {json.dumps(summary, sort_keys=True)}")
+
+def _empty_totals() -> dict:
+    return {"count": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0, "rows": 0, "retries": 0, "errors": 0}
+
+def _add(totals: dict, span: Span) -> None:
+    totals["count"] += 1
+    totals["seconds"] += span.seconds
+    totals["bytes_in"] += span.bytes_in
+    totals["bytes_out"] += span.bytes_out
+    totals["rows"] += span.rows
+    totals["retries"] += span.retries
+    totals["errors"] += int(span.error)
+
+def _iter_totals(summary: dict):
+    yield from summary["stages"].values()
+    for group in ("scrapers", "sources"):
+        for stages in summary[group].values():
+            yield from stages.values()
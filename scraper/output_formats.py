@@ -0,0 +1,91 @@
+# scraper/output_formats.py
+
+import io
+from typing import TYPE_CHECKING
+from scraper.config import PARQUET_COMPRESSION
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+class OutputFormat:
+    """Base class for processed-data serializers"""
+    name = None
+    extension = None
+    content_type = None
+
+    def serialize(self, data_df: "pd.DataFrame", value_type: str = "float") -> bytes:
+        """
+        Serialize a processed series (a Date column plus one value column).
+        `value_type` is the config's 'value_type' ("int" or "float"), for
+        formats that store a typed schema.
+
+        Implementations write straight into a BytesIO and return its
+        getvalue(), which hands over the buffer without copying it, so the
+        payload is held in memory once.
+        """
+        raise NotImplementedError
+
+class CsvFormat(OutputFormat):
+    name = "csv"
+    extension = "csv"
+    content_type = "text/csv"
+
+    def serialize(self, data_df: "pd.DataFrame", value_type: str = "float") -> bytes:
+        # Encode while writing instead of building a str and encoding it afterwards
+        csv_buffer = io.BytesIO()
+        data_df.to_csv(csv_buffer, index=False, encoding="utf-8")
+        return csv_buffer.getvalue()
+
+class ParquetFormat(OutputFormat):
+    """
+    Columnar output with a compact schema: dates as date32, "int" values
+    as int32 when they fit (int64 otherwise) and "float" values as float64.
+    The value type comes from the config rather than the column's dtype,
+    so a float series that happens to hold whole numbers stays float64.
+    """
+    name = "parquet"
+    extension = "parquet"
+    content_type = "application/vnd.apache.parquet"
+
+    def serialize(self, data_df: "pd.DataFrame", value_type: str = "float") -> bytes:
+        import pandas as pd
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("The parquet output format requires the 'pyarrow' package") from e
+
+        columns = {}
+        fields = []
+        for column in data_df.columns:
+            series = data_df[column]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                arrow_type = pa.date32()
+                values = series.dt.date
+            elif value_type == "int":
+                fits_int32 = series.empty or (
+                    series.min() >= -2 ** 31 and series.max() < 2 ** 31
+                )
+                arrow_type = pa.int32() if fits_int32 else pa.int64()
+                values = series.astype("int64")
+            else:
+                arrow_type = pa.float64()
+                values = series.astype(float)
+            columns[column] = pa.array(values, type=arrow_type)
+            fields.append(pa.field(column, arrow_type, nullable=False))
+
+        table = pa.Table.from_pydict(columns, schema=pa.schema(fields))
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression=PARQUET_COMPRESSION)
+        return buffer.getvalue()
+
+OUTPUT_FORMATS = {
+    output_format.name: output_format for output_format in (CsvFormat(), ParquetFormat())
+}
+
+def get_output_format(name: str) -> OutputFormat:
+    """Look up an output format by name ('csv' or 'parquet')."""
+    try:
+        return OUTPUT_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{name}'. Available formats: {', '.join(OUTPUT_FORMATS)}")
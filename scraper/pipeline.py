@@ -0,0 +1,441 @@
+# scraper/pipeline.py
+
+import contextlib
+import contextvars
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from scraper import data_tracker
+from scraper.metrics import span
+from scraper.config import SCRAPER_MAX_WORKERS
+from scraper.leases import claim, get_lease_store
+from scraper.ranges import parse_ranges
+from scraper.scheduler import due_scrapers, has_time_for_file, is_due, order_source_files, seconds_until_due
+
+def plan_source_files(configs: dict) -> dict:
+    """
+    Group scraper configs by the workbook they read from.
+
+    Returns a dict keyed by (url, file_name) whose values are lists of
+    (scraper_name, config) tuples, in the order they appear in `configs`.
+    """
+    plan = {}
+    for name, config in configs.items():
+        source = (config.get('url'), config.get('file_name'))
+        plan.setdefault(source, []).append((name, config))
+    return plan
+
+def run_source_file(source: tuple, scrapers: list, run_metadata: dict = None, run_updates: list = None,
+                    leases: contextlib.ExitStack = None) -> dict:
+    """
+    Download a workbook once, archive it once and run every scraper that
+    reads from it.
+
+    `run_metadata` is an optional preloaded {scraper_name: last run record}
+    mapping (see data_tracker.get_all_run_metadata); without it each
+    scraper's record is read individually. When `run_updates` is given,
+    new last-run records are appended to it for the caller to commit in
+    one batch instead of being written immediately.
+
+    Validators from the previous run are sent with the download, so a
+    304 response or an unchanged content hash skips extract, process and
+    upload for the affected scrapers; those are reported as unchanged.
+    Each sheet is parsed once for every range its scrapers read.
+    Errors are isolated per scraper and returned alongside the names of
+    the scrapers that were processed successfully.
+
+    Before any work the file is leased (see scraper.leases). If another
+    run holds the lease, its due scrapers are reported as claimed and
+    skipped; once the lease is held their records are read again, in case
+    a run that just finished already processed them. The lease is
+    released on return, or when `leases` is closed if the caller passes
+    an ExitStack, so it can outlive the batched commit of `run_updates`.
+    """
+    url, file_name = source
+    result = _new_result()
+
+    # Work out which scrapers actually need this file
+    due = []
+    for name, config in scrapers:
+        try:
+            logging.info(f"Processing scraper: {name}")
+            if config.get('type') != 'monthly':
+                logging.warning(f"Unsupported scraper type: {config.get('type')}")
+                continue
+
+            if run_metadata is not None:
+                metadata = run_metadata.get(name)
+            else:
+                with span("get_run_metadata", scraper=name):
+                    metadata = data_tracker.get_run_metadata(name)
+            if is_due(metadata["timestamp"] if metadata else None):
+                logging.info(f"Update needed for {name}")
+                due.append((name, config, metadata))
+            else:
+                logging.info(f"No update needed for {name}")
+        except Exception as e:
+            _record_error(result, name, e)
+
+    if not due:
+        return result
+
+    store = get_lease_store()
+    with contextlib.ExitStack() as local_leases:
+        if store is not None:
+            with span("acquire_lease", source=file_name):
+                acquired = (leases or local_leases).enter_context(claim(file_name, store))
+            if not acquired:
+                logging.info(f"{file_name} is leased by another run, skipping it")
+                result["claimed"].extend(name for name, _, _ in due)
+                return result
+            due = _recheck_due(due, result)
+            if not due:
+                return result
+        return _run_due_scrapers(url, file_name, due, result, run_updates)
+
+def _recheck_due(due: list, result: dict) -> list:
+    """
+    Re-read the run records of `due` scrapers with one query and keep
+    those still due. If the query fails they are all kept.
+    """
+    names = [name for name, _, _ in due]
+    try:
+        with span("recheck_run_metadata") as stage:
+            run_metadata = data_tracker.get_run_metadata_for(names)
+            stage.set(rows=len(run_metadata))
+    except Exception as e:
+        logging.warning(f"Could not re-read run records for {', '.join(names)}: {str(e)}")
+        return due
+
+    still_due = []
+    for name, config, _ in due:
+        metadata = run_metadata.get(name)
+        if is_due(metadata["timestamp"] if metadata else None):
+            still_due.append((name, config, metadata))
+        else:
+            logging.info(f"{name} was just updated by another run, skipping it")
+            result["claimed"].append(name)
+    return still_due
+
+def _run_due_scrapers(url: str, file_name: str, due: list, result: dict, run_updates: list) -> dict:
+    """Download, archive, extract, process and upload for the `due` scrapers of one file."""
+    # pandas and the blob SDK are only loaded once a file has work to do
+    from scraper.azure_blob import upload_raw_data
+    from scraper.base_scraper import MonthlyDataScraper, extract_sheet_ranges
+    pending = [(name, config, MonthlyDataScraper(config), metadata) for name, config, metadata in due]
+
+    # Download the workbook once for all dependent scrapers
+    names = ", ".join(name for name, _, _, _ in pending)
+    with span("download_excel", source=file_name) as stage:
+        fetch = pending[0][2].fetch_excel(url, file_name, **_shared_validators(pending))
+        if fetch and fetch["content"] is not None:
+            stage.set(bytes_in=len(fetch["content"]))
+    if fetch is None:
+        logging.error(f"Failed to download Excel file {file_name} for {names}.")
+        return result
+
+    if fetch["not_modified"]:
+        for name, _, scraper, metadata in pending:
+            _mark_unchanged(result, name, scraper, metadata, run_updates)
+        return result
+
+    validators = {key: fetch[key] for key in ("etag", "last_modified", "content_hash")}
+    changed = []
+    for name, config, scraper, metadata in pending:
+        if metadata and metadata.get("content_hash") == fetch["content_hash"]:
+            _mark_unchanged(result, name, scraper, validators, run_updates)
+        else:
+            changed.append((name, config, scraper))
+
+    if not changed:
+        return result
+
+    # Archive the workbook once; a version already in the store is not uploaded again
+    content = fetch["content"]
+    try:
+        with span("upload_raw_data", source=file_name) as stage:
+            raw_stats = upload_raw_data(content, file_name, fetch["content_hash"])
+            stage.set(bytes_out=raw_stats["bytes_uploaded"])
+    except Exception as e:
+        logging.error(f"Error uploading raw data for {file_name}: {str(e)}")
+
+    # Read each sheet once, covering every range the changed scrapers need
+    requests = {}
+    extractable = []
+    for name, config, scraper in changed:
+        try:
+            ranges = parse_ranges(config.get('data_location'))
+        except ValueError as e:
+            _record_error(result, name, e)
+            continue
+        requests.setdefault(config.get('sheet_name'), set()).update(ranges)
+        extractable.append((name, config, scraper, ranges))
+    with span("extract_data", source=file_name) as stage:
+        try:
+            tables = extract_sheet_ranges(content, requests, fetch["content_hash"])
+        except Exception as e:
+            logging.error(f"Extraction error for {file_name}: {str(e)}")
+            tables = {}
+        stage.set(bytes_in=len(content), rows=sum(len(table) for table in tables.values() if table is not None))
+
+    for name, config, scraper, ranges in extractable:
+        try:
+            scraper_tables = [tables.get((config.get('sheet_name'), cell_range)) for cell_range in ranges]
+            if any(table is None for table in scraper_tables):
+                logging.error(f"Data extraction failed for {name}.")
+                continue
+
+            with span("process_data", scraper=name) as stage:
+                processed = scraper.process_tables(scraper_tables)
+                stage.set(rows=len(processed))
+            with span("insert_data", scraper=name) as stage:
+                write_stats = scraper.insert_data(processed)
+                if write_stats:
+                    stage.set(bytes_out=write_stats.get("bytes_written"), rows=len(processed))
+            if write_stats:
+                result["write_stats"].append(dict(write_stats, scraper=name))
+            _record_run(name, scraper, validators, run_updates)
+            result["processed"].append(name)
+            logging.info(f"Scraper {name} processed successfully.")
+        except Exception as e:
+            _record_error(result, name, e)
+
+    return result
+
+def run_source_files(plan: dict, max_workers: int = None, deadline: float = None,
+                     run_metadata: dict = None) -> dict:
+    """
+    Run every source file in `plan` concurrently on a bounded thread pool.
+
+    Each file's pipeline is independent and mostly waits on the network,
+    so the total run time approaches that of the slowest file. Last-run
+    records are loaded with one query before the run, unless the caller
+    passes the snapshot it already read (see check_freshness) as
+    `run_metadata`, and committed in one batch after it.
+
+    Files are ordered by scheduler.order_source_files, so scrapers left
+    pending by the previous run go first, then the stalest. A file is only
+    started if enough time remains before `deadline` (a time.monotonic()
+    value); otherwise its scrapers are deferred. Due scrapers that did not
+    finish are saved as a checkpoint for the next run. The checkpoint is
+    also written before work starts, so a run killed midway still leaves
+    a record.
+
+    Source file leases are held until the run records are committed, so
+    an overlapping run never sees a file as both unleased and still due.
+
+    Results are merged in run order into a single processed/unchanged/
+    deferred/claimed/errors dict. Each file runs in a copy of the caller's context,
+    so its stages are recorded by the caller's metrics recorder.
+    """
+    max_workers = max(1, min(max_workers or SCRAPER_MAX_WORKERS, len(plan) or 1))
+    merged = _new_result()
+    if run_metadata is None:
+        run_metadata = load_run_metadata()
+    checkpoint = _load_checkpoint()
+    run_updates = []
+
+    plan = order_source_files(plan, run_metadata, checkpoint)
+    due = due_scrapers(plan, run_metadata) if run_metadata is not None else None
+    if due:
+        _save_checkpoint(due)
+
+    with contextlib.ExitStack() as leases:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper") as executor:
+            futures = [
+                (source, executor.submit(
+                    contextvars.copy_context().run,
+                    _run_before_deadline, source, scrapers, run_metadata, run_updates, deadline, leases,
+                ))
+                for source, scrapers in plan.items()
+            ]
+            for (_, file_name), future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error_msg = f"Error processing source file {file_name}: {str(e)}"
+                    logging.error(f"❌ {error_msg}\n{traceback.format_exc()}")
+                    merged["errors"].append(error_msg)
+                    continue
+                for key in merged:
+                    merged[key].extend(result[key])
+
+        if run_updates:
+            with span("update_runs") as stage:
+                stage.set(rows=len(run_updates))
+                for name in data_tracker.update_runs(run_updates):
+                    merged["errors"].append(f"Error recording last run for scraper {name}")
+
+    # Anything due that did not complete is picked up first next time
+    finished = set(merged["processed"]) | set(merged["unchanged"])
+    pending = [name for name in due if name not in finished] if due is not None else merged["deferred"]
+    if pending or due or checkpoint:
+        _save_checkpoint(pending)
+    return merged
+
+def enqueue_source_files(plan: dict, work_queue, run_metadata: dict = None) -> dict:
+    """
+    Orchestrator mode: send one work item per source file with due
+    scrapers to `work_queue` (a work_queue.StorageWorkQueue or
+    LocalWorkQueue) instead of running them here.
+
+    Files are ordered as in run_source_files, and each item lists only
+    the scrapers due according to one bulk metadata read, or to the
+    `run_metadata` snapshot when given. If that read fails every scraper
+    is listed and the workers check freshness themselves. Returns the
+    file and scraper names enqueued.
+    """
+    from scraper.work_queue import build_work_item
+
+    if run_metadata is None:
+        run_metadata = load_run_metadata()
+    plan = order_source_files(plan, run_metadata, _load_checkpoint())
+    enqueued = {"files": [], "scrapers": []}
+    for source, scrapers in plan.items():
+        if run_metadata is not None:
+            scrapers = [
+                (name, config) for name, config in scrapers
+                if is_due(run_metadata[name]["timestamp"] if name in run_metadata else None)
+            ]
+        if not scrapers:
+            continue
+        with span("enqueue", source=source[1]):
+            work_queue.send(build_work_item(source, scrapers))
+        enqueued["files"].append(source[1])
+        enqueued["scrapers"].extend(name for name, _ in scrapers)
+    logging.info(f"Enqueued {len(enqueued['files'])} source files for {len(enqueued['scrapers'])} scrapers")
+    return enqueued
+
+def run_work_item(item: dict, configs: dict) -> dict:
+    """
+    Worker mode: run one source file's scrapers from a work item (see
+    enqueue_source_files) and record their runs in one batch.
+
+    Freshness is checked again against the item's run records, read with
+    one query, so a redelivered or duplicate item does not redo finished
+    work without touching the lease. The file's lease is held until the
+    runs are recorded.
+    """
+    from scraper.work_queue import resolve_work_item
+
+    source, scrapers = resolve_work_item(item, configs)
+    names = [name for name, _ in scrapers]
+    try:
+        with span("get_run_metadata", source=source[1]) as stage:
+            run_metadata = data_tracker.get_run_metadata_for(names)
+            stage.set(rows=len(run_metadata))
+    except Exception as e:
+        # run_source_file falls back to reading each record
+        logging.warning(f"Could not read run records for {', '.join(names)}: {str(e)}")
+        run_metadata = None
+    run_updates = []
+    with contextlib.ExitStack() as leases:
+        result = run_source_file(source, scrapers, run_metadata, run_updates, leases)
+        if run_updates:
+            with span("update_runs") as stage:
+                stage.set(rows=len(run_updates))
+                for name in data_tracker.update_runs(run_updates):
+                    result["errors"].append(f"Error recording last run for scraper {name}")
+    return result
+
+def _run_before_deadline(source: tuple, scrapers: list, run_metadata: dict, run_updates: list,
+                         deadline: float, leases: contextlib.ExitStack = None) -> dict:
+    """Run one source file, or defer all of its scrapers if the deadline is too close."""
+    if not has_time_for_file(deadline):
+        names = [name for name, _ in scrapers]
+        logging.warning(f"Deferring {source[1]} ({', '.join(names)}): run deadline is too close")
+        result = _new_result()
+        result["deferred"] = names
+        return result
+    return run_source_file(source, scrapers, run_metadata, run_updates, leases)
+
+def check_freshness(configs: dict):
+    """
+    Work out which scrapers in `configs` are due from one bulk metadata query.
+
+    Returns a dict with the due scraper names, the seconds until the next
+    one is due when none are (next_due_in_seconds) and the run records
+    read (run_metadata), which a run started straight after can reuse.
+    Returns None if the bulk query failed.
+    """
+    run_metadata = load_run_metadata()
+    if run_metadata is None:
+        return None
+    due = due_scrapers(plan_source_files(configs), run_metadata)
+    next_due = None
+    if not due:
+        next_due = min(
+            (seconds_until_due(run_metadata[name]["timestamp"]) for name in configs if name in run_metadata),
+            default=0.0,
+        )
+    return {"due": due, "next_due_in_seconds": next_due, "run_metadata": run_metadata}
+
+def load_run_metadata():
+    """
+    Load every scraper's last run record in one query, or return None so
+    callers fall back to per-scraper reads if the bulk query fails.
+    """
+    try:
+        with span("load_run_metadata") as stage:
+            run_metadata = data_tracker.get_all_run_metadata()
+            stage.set(rows=len(run_metadata))
+        return run_metadata
+    except Exception as e:
+        logging.warning(f"Bulk metadata read failed, falling back to per-scraper reads: {str(e)}")
+        return None
+
+def _new_result() -> dict:
+    return {"processed": [], "unchanged": [], "deferred": [], "write_stats": [], "claimed": [], "errors": []}
+
+def _load_checkpoint() -> list:
+    try:
+        with span("load_checkpoint"):
+            return data_tracker.load_checkpoint()
+    except Exception as e:
+        logging.warning(f"Could not load checkpoint: {str(e)}")
+        return []
+
+def _save_checkpoint(pending: list) -> None:
+    try:
+        with span("save_checkpoint") as stage:
+            stage.set(rows=len(pending))
+            data_tracker.save_checkpoint(pending)
+    except Exception as e:
+        logging.warning(f"Could not save checkpoint: {str(e)}")
+
+def _shared_validators(pending: list) -> dict:
+    """
+    Return the etag/last_modified to send with a conditional download.
+
+    A 304 applies to every scraper reading the file, so validators are
+    only used when all pending scrapers last processed the same version.
+    """
+    shared = None
+    for _, _, _, metadata in pending:
+        if not metadata or not (metadata.get("etag") or metadata.get("last_modified")):
+            return {}
+        validators = {"etag": metadata.get("etag"), "last_modified": metadata.get("last_modified")}
+        if shared is not None and validators != shared:
+            return {}
+        shared = validators
+    return shared or {}
+
+def _record_run(name: str, scraper, validators: dict, run_updates: list) -> None:
+    if run_updates is None:
+        scraper.update_last_run(name, validators)
+    else:
+        run_updates.append(scraper.build_run_record(name, validators))
+
+def _mark_unchanged(result: dict, name: str, scraper, validators: dict, run_updates: list) -> None:
+    """Refresh the run timestamp of a scraper whose source file has not changed."""
+    try:
+        _record_run(name, scraper, validators, run_updates)
+        result["unchanged"].append(name)
+        logging.info(f"Source unchanged for {name}, skipping processing.")
+    except Exception as e:
+        _record_error(result, name, e)
+
+def _record_error(result: dict, name: str, error: Exception) -> None:
+    error_msg = f"Error processing scraper {name}: {str(error)}"
+    logging.error(f"❌ {error_msg}\n{traceback.format_exc()}")
+    result["errors"].append(error_msg)
@@ -0,0 +1,104 @@
+# scraper/ranges.py
+
+import functools
+import re
+from typing import NamedTuple
+
+# Largest sheet Excel supports (XFD1048576)
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
+
+# A cell reference such as "K18", "AA10" or "$B$5"
+_CELL_PATTERN = re.compile(r"\$?([A-Za-z]{1,3})\$?([0-9]+)")
+
+class CellRange(NamedTuple):
+    """A rectangular cell range as zero-based, inclusive row and column positions."""
+    start_row: int
+    start_col: int
+    end_row: int
+    end_col: int
+
+    @property
+    def n_rows(self) -> int:
+        return self.end_row - self.start_row + 1
+
+    @property
+    def n_cols(self) -> int:
+        return self.end_col - self.start_col + 1
+
+    def __str__(self) -> str:
+        return (f"{column_letters(self.start_col)}{self.start_row + 1}:"
+                f"{column_letters(self.end_col)}{self.end_row + 1}")
+
+def column_index(letters: str) -> int:
+    """Convert column letters to a zero-based index: 'A' -> 0, 'Z' -> 25, 'AA' -> 26."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def column_letters(index: int) -> str:
+    """Convert a zero-based column index back to letters: 26 -> 'AA'."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def parse_cell(cell: str) -> tuple:
+    """Convert a cell reference such as 'AA10' into zero-based (row, col)."""
+    match = _CELL_PATTERN.fullmatch(cell.strip())
+    if not match:
+        raise ValueError(f"Invalid cell reference: {cell!r}")
+    row = int(match.group(2)) - 1
+    col = column_index(match.group(1))
+    if not 0 <= row < MAX_ROWS or not 0 <= col < MAX_COLUMNS:
+        raise ValueError(f"Cell reference outside the sheet: {cell!r}")
+    return row, col
+
+@functools.lru_cache(maxsize=None)
+def parse_range(text: str) -> CellRange:
+    """
+    Parse one A1 range such as 'A6:K18' or 'AA10:BC40' (a single cell is a
+    one-cell range). Corners may be given in either order. Results are
+    cached, so each distinct range is only parsed once per process.
+    """
+    start, _, end = text.partition(":")
+    start_row, start_col = parse_cell(start)
+    end_row, end_col = parse_cell(end) if end else (start_row, start_col)
+    return CellRange(
+        min(start_row, end_row), min(start_col, end_col),
+        max(start_row, end_row), max(start_col, end_col),
+    )
+
+def parse_ranges(data_location) -> tuple:
+    """
+    Parse a config's 'data_location': one A1 range, several separated by
+    commas ('A6:K18,A22:K34'), or a list of ranges. Returns a tuple of
+    CellRange in the given order.
+    """
+    if isinstance(data_location, str):
+        parts = data_location.split(",")
+    elif isinstance(data_location, (list, tuple)):
+        parts = list(data_location)
+    elif data_location is None:
+        parts = []
+    else:
+        raise ValueError(f"Data location must be a string or a list of ranges, got {data_location!r}")
+    for part in parts:
+        if not isinstance(part, str):
+            raise ValueError(f"Cell range must be a string, got {part!r} in data location {data_location!r}")
+    ranges = tuple(parse_range(part.strip()) for part in parts if part.strip())
+    if not ranges:
+        raise ValueError(f"No cell ranges in data location: {data_location!r}")
+    return ranges
+
+def bounding_range(ranges) -> CellRange:
+    """Return the smallest range covering every range in `ranges`."""
+    return CellRange(
+        min(cell_range.start_row for cell_range in ranges),
+        min(cell_range.start_col for cell_range in ranges),
+        max(cell_range.end_row for cell_range in ranges),
+        max(cell_range.end_col for cell_range in ranges),
+    )
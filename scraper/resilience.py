@@ -0,0 +1,199 @@
+# scraper/resilience.py
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+from scraper.config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY_SECONDS,
+    RUN_DEADLINE_MARGIN_SECONDS,
+)
+from scraper.metrics import record_retry
+
+HOST_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "host.json")
+DEFAULT_FUNCTION_TIMEOUT_SECONDS = 300
+
+# Status codes worth retrying: request timeout, throttling and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After `failure_threshold` consecutive transient failures the circuit
+    opens and calls fail fast for `reset_seconds`. The next call after that
+    is let through as a single trial while concurrent callers keep failing
+    fast: success closes the circuit, failure opens it again.
+    """
+    def __init__(self, host: str, failure_threshold: int, reset_seconds: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_seconds:
+                raise CircuitOpenError(f"Circuit open for {self.host} after {self.failures} failures")
+            # Half-open: let this caller through as the only trial; the
+            # circuit stays open for everyone else until it reports back
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight:
+                self.trial_in_flight = False
+                self.opened_at = time.monotonic()
+                logging.warning(f"Circuit reopened for {self.host}: trial call failed")
+            elif self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                logging.warning(f"Circuit opened for {self.host} after {self.failures} consecutive failures")
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# Deadline (time.monotonic()) of the invocation running in this context.
+# Each invocation sets its own (see run_deadline), so concurrent queue
+# invocations and a warm worker's next request never see another's.
+_run_deadline = contextvars.ContextVar("run_deadline", default=None)
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+            _breakers[host] = breaker
+        return breaker
+
+def get_function_timeout_seconds(host_json_path: str = HOST_JSON_PATH) -> float:
+    """Read functionTimeout ("[d.]hh:mm:ss") from host.json, defaulting to 5 minutes."""
+    try:
+        with open(host_json_path) as f:
+            value = json.load(f).get("functionTimeout")
+    except (OSError, ValueError):
+        value = None
+    if not value or value.startswith("-"):
+        return DEFAULT_FUNCTION_TIMEOUT_SECONDS
+
+    days, _, clock = value.rpartition(".")
+    hours, minutes, seconds = (float(part) for part in clock.split(":"))
+    return (int(days) if days else 0) * 86400 + hours * 3600 + minutes * 60 + seconds
+
+@contextlib.contextmanager
+def run_deadline(started_at: float = None):
+    """
+    Set the deadline for the enclosed invocation to the function timeout
+    minus RUN_DEADLINE_MARGIN_SECONDS, measured from `started_at`
+    (monotonic), and yield it. Retries never sleep past this deadline.
+    The previous deadline is restored on exit.
+    """
+    started_at = started_at if started_at is not None else time.monotonic()
+    deadline = started_at + get_function_timeout_seconds() - RUN_DEADLINE_MARGIN_SECONDS
+    token = _run_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _run_deadline.reset(token)
+
+def call_with_retry(func, host: str, description: str = None, max_attempts: int = None):
+    """
+    Call `func()` with exponential backoff and full jitter on transient
+    failures, honoring Retry-After and the per-host circuit breaker.
+
+    Non-transient errors (for example 404s) are raised immediately. The
+    last error is raised once attempts are exhausted or the next wait
+    would run past the run deadline.
+    """
+    max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    description = description or host
+    breaker = get_circuit_breaker(host)
+    deadline = _run_deadline.get()
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if not is_transient_error(e):
+                # The host answered (a 404, say), so it counts as up
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt >= max_attempts:
+                raise
+
+            delay = _retry_after_seconds(e)
+            if delay is None:
+                delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+            delay = min(delay, RETRY_MAX_DELAY_SECONDS)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                logging.warning(f"Not retrying {description}: run deadline reached")
+                raise
+
+            record_retry()
+            logging.warning(
+                f"Transient error calling {description} (attempt {attempt}/{max_attempts}), "
+                f"retrying in {delay:.2f}s: {str(e)}"
+            )
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+def is_transient_error(error: Exception) -> bool:
+    """Check whether `error` is worth retrying."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        return True
+    if isinstance(error, HttpResponseError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+def _retry_after_seconds(error: Exception):
+    """Return the server's Retry-After delay in seconds, if it sent one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
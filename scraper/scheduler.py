@@ -0,0 +1,59 @@
+# scraper/scheduler.py
+
+import time
+from datetime import datetime
+from scraper.config import SCHEDULER_MIN_FILE_SECONDS
+
+def is_due(last_run, update_frequency_hours: int = 24) -> bool:
+    """Determine if a dataset last run at `last_run` is due for an update"""
+    return seconds_until_due(last_run, update_frequency_hours) <= 0
+
+def seconds_until_due(last_run, update_frequency_hours: int = 24) -> float:
+    """Return how long until a dataset last run at `last_run` is due, 0 if it already is."""
+    if not last_run:
+        return 0.0
+    seconds_since_update = (datetime.utcnow() - last_run).total_seconds()
+    return max(0.0, update_frequency_hours * 3600 - seconds_since_update)
+
+def due_scrapers(plan: dict, run_metadata: dict) -> list:
+    """Return the names of the scrapers in `plan` that are due for an update."""
+    due = []
+    for scrapers in plan.values():
+        for name, _ in scrapers:
+            metadata = run_metadata.get(name)
+            if is_due(metadata["timestamp"] if metadata else None):
+                due.append(name)
+    return due
+
+def order_source_files(plan: dict, run_metadata: dict = None, checkpoint: list = None) -> dict:
+    """
+    Reorder `plan` so the most urgent source files run first.
+
+    Files with scrapers left pending by the previous run (`checkpoint`) come
+    first, in checkpoint order. The rest are ordered by their stalest
+    scraper, with scrapers that never ran counting as the stalest of all.
+    Without metadata the plan order is kept for files not in the checkpoint.
+    """
+    checkpoint_rank = {name: rank for rank, name in enumerate(checkpoint or [])}
+    run_metadata = run_metadata or {}
+
+    def sort_key(item):
+        position, (source, scrapers) = item
+        names = [name for name, _ in scrapers]
+        pending_ranks = [checkpoint_rank[name] for name in names if name in checkpoint_rank]
+        oldest_run = min(
+            (run_metadata[name]["timestamp"] if name in run_metadata else datetime.min for name in names),
+            default=datetime.max,
+        )
+        if pending_ranks:
+            return (0, min(pending_ranks), datetime.min, position)
+        return (1, 0, oldest_run, position)
+
+    ordered = sorted(enumerate(plan.items()), key=sort_key)
+    return {source: scrapers for _, (source, scrapers) in ordered}
+
+def has_time_for_file(deadline: float = None) -> bool:
+    """Check whether another source file can start before the run deadline."""
+    if deadline is None:
+        return True
+    return deadline - time.monotonic() >= SCHEDULER_MIN_FILE_SECONDS
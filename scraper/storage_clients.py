@@ -0,0 +1,164 @@
+# scraper/storage_clients.py
+
+import logging
+import threading
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+from azure.core.exceptions import ResourceExistsError
+from scraper.resilience import call_with_retry
+
+if TYPE_CHECKING:
+    from azure.data.tables import TableServiceClient
+    from azure.storage.blob import BlobServiceClient
+
+# Clients are created once per worker process and reused across invocations,
+# so warm runs keep their HTTP connection pools. They are keyed by connection
+# string so a rotated secret transparently gets fresh clients. The SDK's own
+# retries are disabled because scraper.resilience retries these calls. The
+# SDK client classes are imported on first use, so a run that never touches
+# blobs does not pay for loading the blob SDK.
+_lock = threading.Lock()
+_blob_services = {}
+_table_services = {}
+_container_clients = {}
+_table_clients = {}
+_queue_clients = {}
+
+# Containers, tables and queues known to exist for the life of the process,
+# as (kind, connection string, name), so each create call is sent at most
+# once per resource
+_ensure_lock = threading.Lock()
+_known_resources = set()
+_control_plane_calls = {"create_container": 0, "create_table": 0, "create_queue": 0}
+
+def get_blob_service_client(connection_string: str) -> "BlobServiceClient":
+    """Return the shared BlobServiceClient for `connection_string`."""
+    with _lock:
+        client = _blob_services.get(connection_string)
+        if client is None:
+            from azure.storage.blob import BlobServiceClient
+            client = BlobServiceClient.from_connection_string(connection_string, retry_total=0)
+            _blob_services[connection_string] = client
+        return client
+
+def get_container_client(connection_string: str, container_name: str):
+    """Return a cached ContainerClient that shares the service client's connection pool."""
+    key = (connection_string, container_name)
+    with _lock:
+        client = _container_clients.get(key)
+        if client is not None:
+            return client
+    client = get_blob_service_client(connection_string).get_container_client(container_name)
+    with _lock:
+        return _container_clients.setdefault(key, client)
+
+def get_table_service_client(connection_string: str) -> "TableServiceClient":
+    """Return the shared TableServiceClient for `connection_string`."""
+    with _lock:
+        client = _table_services.get(connection_string)
+        if client is None:
+            from azure.data.tables import TableServiceClient
+            client = TableServiceClient.from_connection_string(conn_str=connection_string, retry_total=0)
+            _table_services[connection_string] = client
+        return client
+
+def get_table_client(connection_string: str, table_name: str):
+    """Return a cached TableClient that shares the service client's connection pool."""
+    key = (connection_string, table_name)
+    with _lock:
+        client = _table_clients.get(key)
+        if client is not None:
+            return client
+    client = get_table_service_client(connection_string).get_table_client(table_name)
+    with _lock:
+        return _table_clients.setdefault(key, client)
+
+def get_queue_client(connection_string: str, queue_name: str):
+    """
+    Return the shared QueueClient for `queue_name`. Messages are Base64
+    encoded, as the Functions queue trigger expects.
+    """
+    key = (connection_string, queue_name)
+    with _lock:
+        client = _queue_clients.get(key)
+        if client is None:
+            from azure.storage.queue import QueueClient, TextBase64EncodePolicy
+            client = QueueClient.from_connection_string(
+                connection_string, queue_name, message_encode_policy=TextBase64EncodePolicy(), retry_total=0
+            )
+            _queue_clients[key] = client
+        return client
+
+def ensure_container(connection_string: str, container_name: str):
+    """
+    Return the container client, creating the container the first time it
+    is requested in this process.
+    """
+    container_client = get_container_client(connection_string, container_name)
+    _ensure_exists("container", connection_string, container_name,
+                   container_client.create_container, storage_host(container_client))
+    return container_client
+
+def ensure_table(connection_string: str, table_name: str):
+    """
+    Return the table client, creating the table the first time it is
+    requested in this process.
+    """
+    table_client = get_table_client(connection_string, table_name)
+    service = get_table_service_client(connection_string)
+    _ensure_exists("table", connection_string, table_name,
+                   lambda: service.create_table(table_name), storage_host(service))
+    return table_client
+
+def ensure_queue(connection_string: str, queue_name: str):
+    """
+    Return the queue client, creating the queue the first time it is
+    requested in this process.
+    """
+    queue_client = get_queue_client(connection_string, queue_name)
+    _ensure_exists("queue", connection_string, queue_name,
+                   queue_client.create_queue, storage_host(queue_client))
+    return queue_client
+
+def _ensure_exists(kind: str, connection_string: str, name: str, create, host: str) -> None:
+    """
+    Call `create` for a container, table or queue unless it is already
+    known to exist in this process.
+
+    Failures other than "already exists" are logged and not remembered,
+    so the next call tries again.
+    """
+    key = (kind, connection_string, name)
+    if key in _known_resources:
+        return
+
+    with _ensure_lock:
+        if key not in _known_resources:
+            _control_plane_calls[f"create_{kind}"] += 1
+            try:
+                call_with_retry(create, host=host, description=f"create {kind} {name}")
+                _known_resources.add(key)
+            except ResourceExistsError:
+                # Already exists - this is expected
+                _known_resources.add(key)
+            except Exception as e:
+                logging.error(f"Error creating {kind} {name}: {str(e)}")
+
+def invalidate_container(connection_string: str, container_name: str) -> None:
+    """Forget that a container exists, e.g. after a write returned 404."""
+    with _ensure_lock:
+        _known_resources.discard(("container", connection_string, container_name))
+
+def invalidate_table(connection_string: str, table_name: str) -> None:
+    """Forget that a table exists, e.g. after a write returned 404."""
+    with _ensure_lock:
+        _known_resources.discard(("table", connection_string, table_name))
+
+def get_control_plane_calls() -> dict:
+    """Return how many create_container/create_table/create_queue requests this process has sent."""
+    with _ensure_lock:
+        return dict(_control_plane_calls, total=sum(_control_plane_calls.values()))
+
+def storage_host(client) -> str:
+    """Return the host a storage client talks to, for retries and circuit breaking."""
+    return urlparse(client.url).netloc
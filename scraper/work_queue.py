@@ -0,0 +1,80 @@
+# scraper/work_queue.py
+
+import json
+import logging
+import queue
+from datetime import datetime
+from scraper.config import WORK_QUEUE_NAME
+from scraper.resilience import call_with_retry
+from scraper.storage_clients import ensure_queue, storage_host
+
+def build_work_item(source: tuple, scrapers: list) -> dict:
+    """Describe one source file and the scrapers to run on it as a queue message body."""
+    url, file_name = source
+    return {
+        "url": url,
+        "file_name": file_name,
+        "scrapers": [name for name, _ in scrapers],
+        "enqueued_at": datetime.utcnow().isoformat(),
+    }
+
+def resolve_work_item(item: dict, configs: dict) -> tuple:
+    """
+    Turn a work item back into ((url, file_name), [(scraper_name, config)]).
+    Scrapers that are no longer configured are dropped with a warning.
+    """
+    scrapers = []
+    for name in item["scrapers"]:
+        if name in configs:
+            scrapers.append((name, configs[name]))
+        else:
+            logging.warning(f"Work item for {item['file_name']} names unknown scraper {name}, skipping it")
+    return (item["url"], item["file_name"]), scrapers
+
+class StorageWorkQueue:
+    """Azure Storage queue of work items, consumed by the QueueWorkerScraper function."""
+    def __init__(self, connection_string: str = None, queue_name: str = WORK_QUEUE_NAME):
+        if connection_string is None:
+            from scraper.azure_blob import get_connection_string
+            connection_string = get_connection_string()
+        self.connection_string = connection_string
+        self.queue_name = queue_name
+
+    def send(self, item: dict) -> None:
+        queue_client = ensure_queue(self.connection_string, self.queue_name)
+        body = json.dumps(item)
+        call_with_retry(
+            lambda: queue_client.send_message(body),
+            host=storage_host(queue_client),
+            description=f"enqueue {item['file_name']} on {self.queue_name}",
+        )
+
+class LocalWorkQueue:
+    """
+    In-process stand-in for StorageWorkQueue, for local runs and tests.
+    Items go through the same JSON encoding as queue messages.
+    """
+    def __init__(self):
+        self._items = queue.Queue()
+
+    def send(self, item: dict) -> None:
+        self._items.put(json.dumps(item))
+
+    def receive(self):
+        """Return the next work item, or None if the queue is empty."""
+        try:
+            return json.loads(self._items.get_nowait())
+        except queue.Empty:
+            return None
+
+    def drain(self, handler) -> list:
+        """Call `handler(item)` for every queued item and return the results."""
+        results = []
+        while True:
+            item = self.receive()
+            if item is None:
+                return results
+            results.append(handler(item))
+
+    def __len__(self) -> int:
+        return self._items.qsize()
@@ -0,0 +1,67 @@
+# scraper/workbook_cache.py
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from io import BytesIO
+import pandas as pd
+from scraper.config import WORKBOOK_CACHE_MAX_ENTRIES, WORKBOOK_CACHE_MAX_BYTES
+
+class WorkbookCache:
+    """
+    LRU cache of opened Excel workbooks keyed by the SHA-256 of their content.
+
+    Several scrapers read different sheets from the same workbook, so the
+    file is decoded once and every sheet is parsed from the shared handle.
+    Entries are evicted least-recently-used first once either the entry
+    count or the total size of the cached files exceeds its limit. Sizes
+    are measured on the raw file bytes; the most recently opened workbook
+    is always kept, even if it alone exceeds `max_bytes`.
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def open(self, content: bytes, content_hash: str = None) -> pd.ExcelFile:
+        """Return a parsed workbook handle for `content`, decoding it only on a cache miss."""
+        key = content_hash or hashlib.sha256(content).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        # Decode outside the lock so other workbooks are not blocked meanwhile
+        workbook = pd.ExcelFile(BytesIO(content))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Another caller decoded the same file first; keep theirs
+                self._entries.move_to_end(key)
+                return entry[0]
+
+            self._entries[key] = (workbook, len(content))
+            self._total_bytes += len(content)
+            self._evict()
+        return workbook
+
+    def _evict(self) -> None:
+        # Callers must hold self._lock
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            key, (_, size) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            logging.info(f"Evicted workbook {key[:12]} ({size} bytes) from cache")
+
+# Process-wide cache shared by all scrapers in this worker
+_cache = WorkbookCache(WORKBOOK_CACHE_MAX_ENTRIES, WORKBOOK_CACHE_MAX_BYTES)
+
+def open_workbook(content: bytes, content_hash: str = None) -> pd.ExcelFile:
+    """Open `content` through the process-wide workbook cache."""
+    return _cache.open(content, content_hash)